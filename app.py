@@ -1,31 +1,103 @@
 from flask import (
     Flask,
+    Request,
+    Response,
     render_template,
     request,
     jsonify,
     session,
     redirect,
+    send_from_directory,
 )
 from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
 from flask_wtf import CSRFProtect
 import csv
 import os
+import re
 import json
+import math
+import zlib
+import gzip
+import zipfile
+import array
+import bisect
+import atexit
+import mmap
+import struct
+import hashlib
+import heapq
+import ipaddress
+import click
 import time
-
-from flask_wtf.csrf import CSRFError
-
+import queue
+import secrets
+import threading
+import random
+import io
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from flask_wtf.csrf import CSRFError, generate_csrf
+
+import gc
+import copy
 import shutil
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machine - lock skip
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:  # optional: sirf gzip use hoga
+    brotli = None
 from difflib import get_close_matches
+from jinja2 import FileSystemBytecodeCache
 
 load_dotenv()
 
 app = Flask(__name__, template_folder="templates")
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "fallback-secret-key")
 
+
+# ---------- JINJA BYTECODE CACHE ----------
+# admin.html/index.html jaise bade templates har naye worker me parse na hon:
+# compiled bytecode data/jinja_cache me rehta hai. Key = sirf template naam
+# (disk path nahi), isliye alag release folder se bhi same file milti hai;
+# file me source checksum hota hai, template badla to jinja khud recompile
+# karke likh deta hai. `flask precompile-templates` deploy par sab pehle se
+# bana deta hai. Directory pehli dump par banti hai, import par nahi.
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", os.path.join("data", "jinja_cache"))
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    def get_cache_key(self, name, filename=None):
+        return super().get_cache_key(name)
+
+    def dump_bytecode(self, bucket):
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+    def cache_path(self, name):
+        return os.path.join(self.directory, self.pattern % self.get_cache_key(name))
+
+
+# CSRFProtect jinja_env bana deta hai, isliye option usse pehle set karo
+app.jinja_options = {
+    **app.jinja_options,
+    "bytecode_cache": TemplateBytecodeCache(JINJA_CACHE_DIR),
+}
+
 app.config.update(
     SESSION_COOKIE_SECURE=True,
     SESSION_COOKIE_HTTPONLY=True,
@@ -47,6 +119,36 @@ def handle_csrf_error(e):
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024
 app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
 
+# Kuch routes (gallery album) ko 16MB se bada body chahiye. Flask 2.3 me
+# request.max_content_length read-only hai, isliye endpoint wise limit
+# request class se aati hai: ROUTE_CONTENT_LENGTHS[endpoint] = bytes.
+ROUTE_CONTENT_LENGTHS = {}
+
+
+class AppRequest(Request):
+    @property
+    def max_content_length(self):
+        limit = ROUTE_CONTENT_LENGTHS.get(self.endpoint)
+        return limit if limit is not None else super().max_content_length
+
+
+app.request_class = AppRequest
+
+
+@app.errorhandler(413)
+def request_too_large(error):
+    """Admin/chat fetch calls res.json() karte hain - HTML 413 unhe tod deta"""
+    limit = request.max_content_length or MAX_CONTENT_LENGTH
+    return (
+        jsonify(
+            {
+                "success": False,
+                "message": f"Request too large (max {limit // (1024 * 1024)} MB)",
+            }
+        ),
+        413,
+    )
+
 os.makedirs("data", exist_ok=True)
 os.makedirs("static/images", exist_ok=True)
 
@@ -86,28 +188,31 @@ def save_admin_config(data):
 
 
 def log_admin_activity(action, status):
-    log_file = "data/admin_activity_logs.csv"
-    file_exists = os.path.exists(log_file)
-
-    with open(log_file, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-
-        if not file_exists:
-            writer.writerow(["timestamp", "ip_address", "action", "status"])
-
-        writer.writerow(
-            [
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                request.remote_addr,
-                action,
-                status,
-            ]
-        )
+    log_data(
+        "admin_activity_logs.csv",
+        [
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            request.remote_addr,
+            action,
+            status,
+        ],
+        headers=["timestamp", "ip_address", "action", "status"],
+    )
 
 
 DATA_FILE = os.path.join("data", "college_data.json")
 SYLLABUS_DB = os.path.join("data", "syllabus_metadata.json")
 GALLERY_DB = os.path.join("data", "gallery_metadata.json")
+LEARNED_ANSWERS_DB = os.path.join("data", "learned_answers.json")
+
+
+def data_version(path):
+    """File ka version stamp (mtime + size), sab workers me same rehta hai"""
+    try:
+        st = os.stat(path)
+        return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+    except OSError:
+        return "0"
 
 
 def load_college_data():
@@ -134,13 +239,17 @@ def save_college_data(data):
     create_backup(DATA_FILE)
 
     try:
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
+        tmp_path = DATA_FILE + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=4)
-        return True
+        os.replace(tmp_path, DATA_FILE)
     except Exception as e:
         print(f"Save Error: {e}")
         return False
 
+    write_knowledge_snapshot(data)
+    return True
+
 
 def load_syllabus_db():
     """Load syllabus metadata safely"""
@@ -166,8 +275,11 @@ def load_gallery_db():
 def save_gallery_db(data):
     create_backup(GALLERY_DB)
     try:
-        with open(GALLERY_DB, "w") as f:
+        # temp file + replace: aadha likha JSON kabhi nahi dikhega
+        tmp_path = GALLERY_DB + ".tmp"
+        with open(tmp_path, "w") as f:
             json.dump(data, f, indent=4)
+        os.replace(tmp_path, GALLERY_DB)
         return True
     except:
         return False
@@ -177,14 +289,75 @@ def save_syllabus_db(data):
     """Save new syllabus data"""
     create_backup(SYLLABUS_DB)
     try:
-        with open(SYLLABUS_DB, "w", encoding="utf-8") as f:
+        tmp_path = SYLLABUS_DB + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=4)
+        os.replace(tmp_path, SYLLABUS_DB)
         return True
     except Exception as e:
         print(f"Syllabus Save Error: {e}")
         return False
 
 
+def college_data_version():
+    """college_info ka version: file stamp + is worker me loaded object"""
+    return f"{data_version(DATA_FILE)}:{id(college_info)}"
+
+
+COURSE_SECTIONS = ("ug_courses", "pg_courses", "diploma_courses")
+CONTACT_SECTIONS = ("name", "address", "phone", "email", "website", "map_link")
+
+section_versions = {"id": None, "versions": {}}
+
+
+def college_section_version(*sections):
+    """Sirf in sections ke content ka hash - baaki data badle to version same.
+    Har loaded college_info object par ek baar (lazily) calculate hota hai."""
+    if section_versions["id"] != id(college_info):
+        section_versions.update(id=id(college_info), versions={})
+    versions = section_versions["versions"]
+    for section in sections:
+        if section not in versions:
+            raw = json.dumps(college_info.get(section), sort_keys=True).encode("utf-8")
+            versions[section] = hashlib.sha1(raw).hexdigest()[:12]
+    return ":".join(versions[section] for section in sections)
+
+
+def load_learned_answers():
+    """Admin ke diye hue jawab (resolved unknown queries)"""
+    if os.path.exists(LEARNED_ANSWERS_DB):
+        try:
+            with open(LEARNED_ANSWERS_DB, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, ValueError):
+            return []
+    return []
+
+
+def save_learned_answer(query, answer):
+    """Resolved query ka jawab save karo, same query dobara aaye to replace"""
+    data = [
+        item
+        for item in load_learned_answers()
+        if item.get("query", "").lower() != query.lower()
+    ]
+    data.append(
+        {
+            "query": query,
+            "answer": answer,
+            "added_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        }
+    )
+    create_backup(LEARNED_ANSWERS_DB)
+    try:
+        with open(LEARNED_ANSWERS_DB, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+        return True
+    except Exception as e:
+        print(f"Learned answer save error: {e}")
+        return False
+
+
 college_info = load_college_data()
 
 
@@ -193,7 +366,9 @@ def admin_get_data():
     """Admin dashboard data API"""
     if not session.get("admin"):
         return jsonify({"error": "Unauthorized"}), 401
-    return jsonify(load_college_data())
+    response = jsonify(load_college_data())
+    response.set_etag(data_version(DATA_FILE))  # PATCH ke If-Match ke liye
+    return response
 
 
 @app.route("/admin/save-data", methods=["POST"])
@@ -203,38 +378,1040 @@ def admin_save_data():
         return jsonify({"error": "Unauthorized"}), 401
 
     new_data = request.json
+    errors = validate_college_data(new_data)
+    if errors:
+        return (
+            jsonify({"success": False, "message": "Invalid data", "errors": errors}),
+            400,
+        )
+
     if save_college_data(new_data):
         global college_info
         college_info = new_data
+        publish_admin_event("college_data")
         return jsonify({"success": True, "message": "Data updated successfully!"})
 
     return jsonify({"success": False, "message": "Failed to save data."}), 500
 
 
-def log_data(filename, data_list, headers=None):
-    """Log data to CSV file"""
+# ---------- COLLEGE DATA: SCHEMA + JSON PATCH ----------
+# PATCH /admin/college-data RFC 6902 operations leta hai. Schema ek baar
+# validator functions me compile hota hai. Patch lock ke andar disk wale
+# latest data par lagta hai, version (If-Match) match na ho to 409.
+# Response me badle sections aate hain aur sirf unke dependent caches bante hain.
+STRING = {"type": "string", "maxLength": 5000}
+COURSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "desc": STRING,
+        "duration": STRING,
+        "fee": STRING,
+        "syllabus": STRING,
+    },
+    "required": ["desc", "duration", "fee"],
+}
+COLLEGE_DATA_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **{name: STRING for name in CONTACT_SECTIONS},
+        "accreditation": STRING,
+        "principal": {
+            "type": "object",
+            "properties": {"name": STRING, "education": STRING, "role": STRING},
+            "required": ["name"],
+        },
+        "director": {
+            "type": "object",
+            "properties": {"name": STRING, "role": STRING, "message": STRING},
+            "required": ["name"],
+        },
+        "facilities": {"type": "object", "additionalProperties": STRING},
+        **{
+            name: {"type": "object", "additionalProperties": COURSE_SCHEMA}
+            for name in COURSE_SECTIONS
+        },
+    },
+    "required": ["name", "phone", *COURSE_SECTIONS, "facilities"],
+}
+JSON_TYPES = {"object": dict, "array": list, "string": str}
+MAX_PATCH_OPS = 200
+
+# section badle to kaunse caches/indexes dobara banane hain
+SECTION_DEPENDENTS = {
+    **{
+        name: ("course_index", "fee_index", "api:courses", "retrieval")
+        for name in COURSE_SECTIONS
+    },
+    **{name: ("api:college-info", "retrieval") for name in CONTACT_SECTIONS},
+    "facilities": ("api:facilities", "retrieval"),
+}
+
+
+def compile_schema(schema):
+    """Schema -> validate(value, path) function (recursion ek baar yahin)"""
+    expected = JSON_TYPES.get(schema.get("type"))
+    max_length = schema.get("maxLength")
+    required = schema.get("required", [])
+    properties = {k: compile_schema(v) for k, v in schema.get("properties", {}).items()}
+    extra = schema.get("additionalProperties")
+    extra = compile_schema(extra) if isinstance(extra, dict) else None
+
+    def validate(value, path=""):
+        if expected and not isinstance(value, expected):
+            return [f"{path or '/'}: expected {schema['type']}"]
+        errors = []
+        if max_length and len(value) > max_length:
+            errors.append(f"{path}: longer than {max_length}")
+        if isinstance(value, dict):
+            errors.extend(f"{path}/{k}: required" for k in required if k not in value)
+            for key, item in value.items():
+                check = properties.get(key, extra)
+                if check:
+                    errors.extend(check(item, f"{path}/{key}"))
+        return errors
+
+    return validate
+
+
+validate_college_data = compile_schema(COLLEGE_DATA_SCHEMA)
+
+
+def parse_json_pointer(pointer):
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise ValueError(f"Invalid path: {pointer!r}")
+    if pointer == "":
+        return []
+    return [p.replace("~1", "/").replace("~0", "~") for p in pointer[1:].split("/")]
+
+
+def pointer_index(container, part, allow_end=False):
+    if part == "-" and allow_end:
+        return len(container)
+    if not part.isdigit() or (part != "0" and part.startswith("0")):
+        raise ValueError(f"Invalid array index: {part}")
+    index = int(part)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise ValueError(f"Array index out of range: {part}")
+    return index
+
+
+def pointer_get(doc, parts):
+    for part in parts:
+        if isinstance(doc, dict):
+            if part not in doc:
+                raise ValueError(f"Path not found: {part}")
+            doc = doc[part]
+        elif isinstance(doc, list):
+            doc = doc[pointer_index(doc, part)]
+        else:
+            raise ValueError(f"Path not found: {part}")
+    return doc
+
+
+def pointer_add(doc, parts, value):
+    if not parts:
+        return value
+    parent = pointer_get(doc, parts[:-1])
+    if isinstance(parent, dict):
+        parent[parts[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(pointer_index(parent, parts[-1], allow_end=True), value)
+    else:
+        raise ValueError("Cannot add to a scalar")
+    return doc
+
+
+def pointer_remove(doc, parts):
+    if not parts:
+        raise ValueError("Cannot remove the whole document")
+    parent = pointer_get(doc, parts[:-1])
+    if isinstance(parent, dict):
+        if parts[-1] not in parent:
+            raise ValueError(f"Path not found: {parts[-1]}")
+        return parent.pop(parts[-1])
+    if isinstance(parent, list):
+        return parent.pop(pointer_index(parent, parts[-1]))
+    raise ValueError("Cannot remove from a scalar")
+
+
+def apply_json_patch(doc, operations):
+    """RFC 6902 add/remove/replace/move/copy/test; doc ki copy par kaam"""
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("Patch must be a non-empty list")
+    if len(operations) > MAX_PATCH_OPS:
+        raise ValueError(f"Max {MAX_PATCH_OPS} operations per patch")
+
+    doc = copy.deepcopy(doc)
+    for i, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f"Operation {i}: must be an object")
+        op = operation.get("op")
+        parts = parse_json_pointer(operation.get("path"))
+        try:
+            if op in ("add", "replace", "test") and "value" not in operation:
+                raise ValueError("value required")
+            if op == "add":
+                doc = pointer_add(doc, parts, copy.deepcopy(operation["value"]))
+            elif op == "remove":
+                pointer_remove(doc, parts)
+            elif op == "replace":
+                if parts:
+                    pointer_remove(doc, parts)
+                doc = pointer_add(doc, parts, copy.deepcopy(operation["value"]))
+            elif op in ("move", "copy"):
+                source = parse_json_pointer(operation.get("from"))
+                if op == "move":
+                    if parts[: len(source)] == source and parts != source:
+                        raise ValueError("Cannot move into own child")
+                    value = pointer_remove(doc, source)
+                else:
+                    value = copy.deepcopy(pointer_get(doc, source))
+                doc = pointer_add(doc, parts, value)
+            elif op == "test":
+                if pointer_get(doc, parts) != operation["value"]:
+                    raise ValueError("test failed")
+            else:
+                raise ValueError(f"Unknown op {op!r}")
+        except ValueError as e:
+            raise ValueError(f"Operation {i} ({op} {operation.get('path')}): {e}")
+    return doc
+
+
+def rebuild_dependents(changed):
+    """Sirf badle sections ke dependent caches is worker me abhi bana do"""
+    dependents = set()
+    for section in changed:
+        dependents.update(SECTION_DEPENDENTS.get(section, ("retrieval",)))
+
+    # snapshot valid ho to course/fee index aur API bodies worker me bante hi nahi
+    if get_knowledge_snapshot() is None:
+        if "course_index" in dependents:
+            get_course_index()
+        if "fee_index" in dependents:
+            get_fee_index()
+        for name in dependents:
+            if name.startswith("api:"):
+                api_body_entry(name[len("api:") :])
+    if "retrieval" in dependents:
+        refresh_retrieval_index()
+    return sorted(dependents)
+
+
+@app.route("/admin/college-data", methods=["PATCH"])
+def admin_patch_data():
+    """JSON Patch body + If-Match (ya body me version) se optimistic lock"""
+    if not session.get("admin"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    body = request.get_json(silent=True)
+    # If-Match: W/ aur kai ETags ki list bhi chalegi ("-gzip" suffix
+    # compression_middleware pehle hi hata deta hai)
+    if_match = request.if_match
+    operations = body
+    version_in_body = None
+    if isinstance(body, dict):
+        operations = body.get("patch")
+        version_in_body = body.get("version")
+    if not version_in_body and not if_match:
+        return (
+            jsonify({"success": False, "message": "Version (If-Match) required"}),
+            428,
+        )
+
+    global college_info
+    with log_lock(DATA_FILE):
+        current_version = data_version(DATA_FILE)
+        if version_in_body:
+            matches = version_in_body == current_version
+        else:
+            matches = if_match.contains_weak(current_version)  # "*" bhi
+        if not matches:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "message": "Data changed, reload and retry",
+                        "version": current_version,
+                    }
+                ),
+                409,
+            )
+
+        current = load_college_data()
+        try:
+            updated = apply_json_patch(current, operations)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        errors = validate_college_data(updated)
+        if errors:
+            return (
+                jsonify(
+                    {"success": False, "message": "Invalid data", "errors": errors}
+                ),
+                422,
+            )
+
+        changed = sorted(
+            key
+            for key in set(current) | set(updated)
+            if current.get(key) != updated.get(key)
+        )
+        if changed and not save_college_data(updated):
+            return jsonify({"success": False, "message": "Failed to save data."}), 500
+        new_version = data_version(DATA_FILE)
+
+    college_info = updated
+    rebuilt = rebuild_dependents(changed) if changed else []
+    if changed:
+        publish_admin_event("college_data", sections=changed)
+
+    response = jsonify(
+        {
+            "success": True,
+            "version": new_version,
+            "changed": changed,
+            "rebuilt": rebuilt,
+        }
+    )
+    response.set_etag(new_version)
+    return response
+
+
+# ---------- CSV LOG STORAGE (rotation + gzip segments) ----------
+# Active file data/<name>.csv hai. Size ya age limit paar hote hi wo
+# data/archive/<name>.<time>.csv.gz segment ban jaata hai aur
+# data/archive/<name>.manifest.json me rows + time range likhi jaati hai.
+# Readers manifest dekh ke sirf zaroori segments kholte hain.
+LOG_ARCHIVE_DIR = os.path.join("data", "archive")
+LOG_ROTATE_BYTES = int(os.getenv("LOG_ROTATE_BYTES", 2 * 1024 * 1024))
+LOG_ROTATE_SECONDS = int(os.getenv("LOG_ROTATE_SECONDS", 7 * 24 * 3600))
+LOG_RETAIN_SEGMENTS = int(os.getenv("LOG_RETAIN_SEGMENTS", 100))
+LOG_AGE_CHECK_INTERVAL = 60
+LOG_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+CHAT_LOG = os.path.join("data", "chat_logs.csv")
+UNKNOWN_QUERIES_LOG = os.path.join("data", "unknown_queries.csv")
+
+log_age_checked = {}
+
+
+@contextmanager
+def log_lock(path, shared=False):
+    """Sab workers ke beech file lock: append/rotate exclusive, readers shared"""
+    if fcntl is None or (shared and not os.path.isdir(os.path.dirname(path) or ".")):
+        yield
+        return
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def log_manifest_path(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(LOG_ARCHIVE_DIR, f"{name}.manifest.json")
+
+
+def load_log_manifest(path):
+    manifest_path = log_manifest_path(path)
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, ValueError):
+            pass
+    return {"segments": []}
+
+
+def save_log_manifest(path, manifest):
+    manifest_path = log_manifest_path(path)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def log_needs_rotation(path):
     try:
-        os.makedirs("data", exist_ok=True)
+        if os.path.getsize(path) >= LOG_ROTATE_BYTES:
+            return True
+    except OSError:
+        return False
 
-        path = os.path.join("data", filename)
+    # age check har write par nahi, minute me ek baar
+    now = time.time()
+    if now - log_age_checked.get(path, 0) < LOG_AGE_CHECK_INTERVAL:
+        return False
+    log_age_checked[path] = now
+
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        first = next(reader, None)
+    if not first:
+        return False
+    try:
+        started = datetime.strptime(first[0], LOG_TIME_FORMAT)
+    except ValueError:
+        return False
+    return (datetime.now() - started).total_seconds() >= LOG_ROTATE_SECONDS
+
+
+def rotate_log(path):
+    """Active CSV ko gzip segment me badlo (log_lock ke andar call karo)"""
+    if not os.path.exists(path):
+        return None
+
+    os.makedirs(LOG_ARCHIVE_DIR, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+    segment_name = f"{name}.{datetime.now().strftime('%Y%m%dT%H%M%S%f')}.csv.gz"
+    segment_path = os.path.join(LOG_ARCHIVE_DIR, segment_name)
+
+    rows = 0
+    first = last = ""
+    with open(path, "r", encoding="utf-8", newline="") as src, gzip.open(
+        segment_path, "wt", encoding="utf-8", newline=""
+    ) as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst)
+        header = next(reader, None)
+        if header:
+            writer.writerow(header)
+        for row in reader:
+            writer.writerow(row)
+            rows += 1
+            if row:
+                first = first or row[0]
+                last = row[0]
+
+    manifest = load_log_manifest(path)
+    manifest["segments"].append(
+        {
+            "file": segment_name,
+            "rows": rows,
+            "first": first,
+            "last": last,
+            "bytes": os.path.getsize(segment_path),
+        }
+    )
+
+    # disk bounded rahe: purane segments hatao
+    while len(manifest["segments"]) > LOG_RETAIN_SEGMENTS:
+        old = manifest["segments"].pop(0)
+        manifest["dropped"] = manifest.get("dropped", 0) + old["rows"]
+        try:
+            os.remove(os.path.join(LOG_ARCHIVE_DIR, old["file"]))
+        except OSError:
+            pass
+
+    save_log_manifest(path, manifest)
+    os.remove(path)
+    return segment_name
+
+
+def append_log_rows(path, rows, headers=None):
+    """Rows append karo aur zaroorat ho to rotate"""
+    with log_lock(path):
         exists = os.path.isfile(path)
         with open(path, "a", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             if not exists and headers:
                 writer.writerow(headers)
-            writer.writerow(data_list)
+            writer.writerows(rows)
+
+        if log_needs_rotation(path):
+            rotate_log(path)
+
+
+def log_data(filename, data_list, headers=None):
+    """Log data to CSV file"""
+    log_rows(filename, [data_list], headers=headers)
+
+
+def log_rows(filename, rows, headers=None):
+    """Log many rows to CSV file with a single open/write"""
+    if not rows:
+        return
+    try:
+        os.makedirs("data", exist_ok=True)
+        append_log_rows(os.path.join("data", filename), rows, headers=headers)
     except Exception as e:
         print(f"Logging error: {e}")
 
 
+def open_log_segment(segment):
+    return gzip.open(
+        os.path.join(LOG_ARCHIVE_DIR, segment["file"]),
+        "rt",
+        encoding="utf-8",
+        newline="",
+    )
+
+
+def read_log_rows(path, since=None, until=None, start=0):
+    """Segments + active file ke rows purane se naye kram me (generator).
+    since/until timestamp strings hain aur start pehle ke rows chhodta hai;
+    bahar wale segments khole hi nahi jaate."""
+
+    def matching(rows, skip):
+        for row in rows:
+            if skip:
+                skip -= 1
+                continue
+            ts = row.get("timestamp") or ""
+            if (since and ts < since) or (until and ts > until):
+                continue
+            yield row
+
+    # manifest aur files shared lock me khol lo; rotate baad me file hata de
+    # tab bhi khule handles wahi snapshot padhte hain
+    handles = []
+    with log_lock(path, shared=True):
+        for segment in load_log_manifest(path)["segments"]:
+            if start >= segment["rows"]:
+                start -= segment["rows"]
+                continue
+            if since and segment["last"] and segment["last"] < since:
+                start = 0
+                continue
+            if until and segment["first"] and segment["first"] > until:
+                start = 0
+                continue
+            handles.append((open_log_segment(segment), start))
+            start = 0
+
+        if os.path.exists(path):
+            handles.append((open(path, "r", encoding="utf-8", newline=""), start))
+
+    try:
+        for f, skip in handles:
+            yield from matching(csv.DictReader(f), skip)
+    finally:
+        for f, _ in handles:
+            f.close()
+
+
+def tail_log_rows(path, limit):
+    """Sabse naye `limit` rows (naye pehle); sirf aakhri segments khulte hain"""
+    result = []
+    with log_lock(path, shared=True):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                result = list(csv.DictReader(f))[::-1][:limit]
+
+        for segment in reversed(load_log_manifest(path)["segments"]):
+            if len(result) >= limit:
+                break
+            with open_log_segment(segment) as f:
+                result.extend(list(csv.DictReader(f))[::-1][: limit - len(result)])
+    return result
+
+
+def manifest_row_count(path, manifest):
+    """Segments ka count manifest se, sirf active file padhi jaati hai"""
+    total = sum(seg["rows"] for seg in manifest["segments"])
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            total += max(sum(1 for _ in csv.reader(f)) - 1, 0)
+    return total
+
+
+def count_log_rows(path):
+    """Total rows (rotate ke beech bhi sahi - shared lock me)"""
+    with log_lock(path, shared=True):
+        return manifest_row_count(path, load_log_manifest(path))
+
+
+def log_rows_version(path):
+    """(dropped, total, edits): naye rows total badhate hain, edit/retention
+    baaki do. Sirf total badla ho to purane rows waise hi hain."""
+    with log_lock(path, shared=True):
+        manifest = load_log_manifest(path)
+        total = manifest_row_count(path, manifest)
+    dropped = manifest.get("dropped", 0)
+    return dropped, dropped + total, manifest.get("edits", 0)
+
+
+def update_log_row(path, index, updates):
+    """index wale row (purane se naye kram me) me updates lagao.
+    Sirf wahi segment ya active file dobara likhi jaati hai."""
+    with log_lock(path):
+        manifest = load_log_manifest(path)
+        offset = index
+        target = None
+        for segment in manifest["segments"]:
+            if offset < segment["rows"]:
+                target = segment
+                break
+            offset -= segment["rows"]
+
+        if target:
+            with open_log_segment(target) as f:
+                reader = csv.DictReader(f)
+                fieldnames = reader.fieldnames
+                rows = list(reader)
+        elif os.path.exists(path):
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                reader = csv.DictReader(f)
+                fieldnames = reader.fieldnames
+                rows = list(reader)
+        else:
+            return None
+
+        if offset < 0 or offset >= len(rows):
+            return None
+
+        rows[offset].update(updates)
+        fieldnames = list(fieldnames) + [k for k in updates if k not in fieldnames]
+
+        # edits counter se readers jaan lete hain ki purane rows badle hain
+        manifest["edits"] = manifest.get("edits", 0) + 1
+        os.makedirs(LOG_ARCHIVE_DIR, exist_ok=True)
+        save_log_manifest(path, manifest)
+
+        if target:
+            segment_path = os.path.join(LOG_ARCHIVE_DIR, target["file"])
+            tmp_path = segment_path + ".tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(
+                    f, fieldnames=fieldnames, extrasaction="ignore"
+                )
+                writer.writeheader()
+                writer.writerows(rows)
+            os.replace(tmp_path, segment_path)
+        else:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(
+                    f, fieldnames=fieldnames, extrasaction="ignore"
+                )
+                writer.writeheader()
+                writer.writerows(rows)
+            os.replace(tmp_path, path)
+
+        return rows[offset]
+
+
+# ---------- CHAT ANALYTICS ROLLUPS ----------
+# Har chat row likhte waqt hourly/daily counters badhte hain. Har bucket ek
+# fixed layout wala int array hai: [total, unknown, intents..., ua families...].
+# Worker apne deltas memory me rakhta hai aur thodi der me data/chat_rollups.json
+# me merge karta hai (flock ke saath), isliye admin ko poori log scan nahi karni padti.
+CHAT_LOG_HEADERS = ["timestamp", "user_message", "bot_response", "user_agent"]
+ROLLUP_DB = os.path.join("data", "chat_rollups.json")
+ROLLUP_HOURS = 48
+ROLLUP_DAYS = 90
+ROLLUP_QUERY_DAYS = 14
+ROLLUP_QUERY_SLOTS = 200
+ROLLUP_FLUSH_ROWS = 25
+ROLLUP_FLUSH_SECONDS = 10
+
+# Bot ke jawab ki shuruaat se intent pehchano (history replay me bhi chalega).
+# Order zaroori hai: specific prefixes pehle.
+CHAT_INTENT_PREFIXES = [
+    ("unknown", ("😊 Sorry", "🤔 Did you mean")),
+    ("greeting", ("🙏 नमस्ते", "👋 Hello")),
+    ("thanks", ("😊 Aapka swagat",)),
+    ("principal", ("👩🏫 **Principal",)),
+    ("director", ("👨💼 **Director",)),
+    ("syllabus", ("📄 **Syllabus",)),
+    ("transport", ("🚌", "🏫 **TRANSPORT")),
+    ("hostel", ("🏠", "🏫 **HOSTEL")),
+    ("labs", ("🔬", "🏫 **LABS")),
+    ("library", ("📚 **LIBRARY", "🏫 **LIBRARY")),
+    ("sports", ("⚽", "🏫 **SPORTS")),
+    ("incubation", ("🏭", "🏫 **INCUBATION")),
+    ("facilities", ("🏫",)),
+    ("contact", ("📞 Contact",)),
+    ("about", ("<img",)),
+    ("course", ("🎯",)),
+    ("scholarship", ("💰 SCHOLARSHIP",)),
+    ("fees", ("💰", "Fee category")),
+    ("course_list", ("🏛️", "Category select")),
+    ("admission_date", ("📅 ADMISSION",)),
+    ("admission", ("📋 ADMISSION",)),
+    ("semester", ("📖 SEMESTER",)),
+    ("attendance", ("📊 Attendance",)),
+    ("exam", ("📝 Exam",)),
+    ("placement", ("💼",)),
+    ("gallery", ("📸",)),
+]
+CHAT_INTENTS = [name for name, _ in CHAT_INTENT_PREFIXES] + ["other"]
+UA_FAMILIES = ["android", "ios", "windows", "mac", "linux", "kiosk", "bot", "other"]
+ROLLUP_FIELDS = (
+    ["total", "unknown"]
+    + [f"intent:{i}" for i in CHAT_INTENTS]
+    + [f"ua:{u}" for u in UA_FAMILIES]
+)
+ROLLUP_INDEX = {name: i for i, name in enumerate(ROLLUP_FIELDS)}
+
+rollup_lock = threading.Lock()
+rollup_flush_lock = threading.Lock()
+rollup_pending = {
+    "rows": 0,
+    "since": time.time(),
+    "hourly": {},
+    "daily": {},
+    "queries": {},
+}
+
+
+def classify_intent(bot_response):
+    text = (bot_response or "").lstrip()
+    for name, prefixes in CHAT_INTENT_PREFIXES:
+        if text.startswith(prefixes):
+            return name
+    return "other"
+
+
+def user_agent_family(user_agent):
+    ua = (user_agent or "").lower()
+    if "kiosk" in ua or "whatsapp" in ua:
+        return "kiosk"
+    if any(b in ua for b in ("bot", "crawl", "spider", "curl", "python", "werkzeug")):
+        return "bot"
+    if "android" in ua:
+        return "android"
+    if "iphone" in ua or "ipad" in ua:
+        return "ios"
+    if "windows" in ua:
+        return "windows"
+    if "mac os" in ua or "macintosh" in ua:
+        return "mac"
+    if "linux" in ua:
+        return "linux"
+    return "other"
+
+
+def add_top_query(table, query, count=1):
+    """Space-saving top-k: table kabhi ROLLUP_QUERY_SLOTS se bada nahi hota"""
+    if query in table or len(table) < ROLLUP_QUERY_SLOTS:
+        table[query] = table.get(query, 0) + count
+        return
+    smallest = min(table, key=table.get)
+    table[query] = table.pop(smallest) + count
+
+
+def add_rollup_row(target, row):
+    """Ek chat log row (timestamp, message, response, user agent) ko counters me jodo"""
+    timestamp, message, bot_response, user_agent = (list(row) + [""] * 4)[:4]
+    if len(timestamp) < 13:
+        return
+
+    intent = classify_intent(bot_response)
+    for period, key in (("hourly", timestamp[:13]), ("daily", timestamp[:10])):
+        bucket = target[period].get(key)
+        if bucket is None:
+            bucket = target[period][key] = array.array("l", [0] * len(ROLLUP_FIELDS))
+        bucket[0] += 1
+        if intent == "unknown":
+            bucket[1] += 1
+        bucket[ROLLUP_INDEX[f"intent:{intent}"]] += 1
+        bucket[ROLLUP_INDEX[f"ua:{user_agent_family(user_agent)}"]] += 1
+
+    query = " ".join((message or "").lower().split())[:100]
+    if query:
+        add_top_query(target["queries"].setdefault(timestamp[:10], {}), query)
+
+
+def load_rollups():
+    empty = {"fields": ROLLUP_FIELDS, "hourly": {}, "daily": {}, "queries": {}}
+    if not os.path.exists(ROLLUP_DB):
+        return empty
+    try:
+        with open(ROLLUP_DB, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, ValueError):
+        return empty
+
+    if data.get("fields") != ROLLUP_FIELDS:
+        # naye intents add hue - purane buckets naam se remap karo
+        old_fields = data.get("fields", [])
+        for period in ("hourly", "daily"):
+            for key, values in data.get(period, {}).items():
+                remapped = [0] * len(ROLLUP_FIELDS)
+                for name, value in zip(old_fields, values):
+                    if name in ROLLUP_INDEX:
+                        remapped[ROLLUP_INDEX[name]] = value
+                data[period][key] = remapped
+        data["fields"] = ROLLUP_FIELDS
+    return data
+
+
+def prune_rollups(data):
+    now = datetime.now()
+    oldest_hour = (now - timedelta(hours=ROLLUP_HOURS)).strftime("%Y-%m-%d %H")
+    oldest_day = (now - timedelta(days=ROLLUP_DAYS)).strftime("%Y-%m-%d")
+    oldest_query_day = (now - timedelta(days=ROLLUP_QUERY_DAYS)).strftime("%Y-%m-%d")
+    data["hourly"] = {k: v for k, v in data["hourly"].items() if k >= oldest_hour}
+    data["daily"] = {k: v for k, v in data["daily"].items() if k >= oldest_day}
+    data["queries"] = {
+        k: v for k, v in data["queries"].items() if k >= oldest_query_day
+    }
+
+
+def save_rollups(data):
+    tmp_path = ROLLUP_DB + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, ROLLUP_DB)
+
+
+def forget_flushed_rollups(pending):
+    """File me likhe ja chuke deltas ghatao; beech me aaye naye rows bache rehte hain"""
+    for period in ("hourly", "daily"):
+        for key, values in pending[period].items():
+            bucket = rollup_pending[period].get(key)
+            if bucket is None:
+                continue
+            for i, value in enumerate(values):
+                bucket[i] -= value
+            if not bucket[0]:
+                del rollup_pending[period][key]
+    for day, table in pending["queries"].items():
+        current = rollup_pending["queries"].get(day, {})
+        for query, count in table.items():
+            if current.get(query, 0) > count:
+                current[query] -= count
+            else:
+                current.pop(query, None)
+        if not current:
+            rollup_pending["queries"].pop(day, None)
+    rollup_pending["rows"] = max(rollup_pending["rows"] - pending["rows"], 0)
+    rollup_pending["since"] = time.time()
+
+
+def flush_rollups():
+    """Is worker ke pending deltas ko shared rollup file me merge karo.
+    Deltas file likh jaane ke baad hi hatte hain; fail par agli flush me jaate."""
+    with rollup_flush_lock:
+        with rollup_lock:
+            if not rollup_pending["rows"]:
+                return
+            pending = {
+                "rows": rollup_pending["rows"],
+                "hourly": {k: list(v) for k, v in rollup_pending["hourly"].items()},
+                "daily": {k: list(v) for k, v in rollup_pending["daily"].items()},
+                "queries": {
+                    day: dict(table) for day, table in rollup_pending["queries"].items()
+                },
+            }
+
+        try:
+            write_rollup_deltas(pending)
+        except Exception as e:
+            print(f"Rollup flush error: {e}")
+            return
+
+        with rollup_lock:
+            forget_flushed_rollups(pending)
+
+
+def write_rollup_deltas(pending):
+    with log_lock(ROLLUP_DB):
+        data = load_rollups()
+        for period in ("hourly", "daily"):
+            for key, values in pending[period].items():
+                current = data[period].get(key) or [0] * len(ROLLUP_FIELDS)
+                data[period][key] = [a + b for a, b in zip(current, values)]
+        for day, table in pending["queries"].items():
+            merged = data["queries"].setdefault(day, {})
+            for query, count in table.items():
+                add_top_query(merged, query, count)
+        prune_rollups(data)
+        save_rollups(data)
+
+
+atexit.register(flush_rollups)
+
+
+def record_chat_rollup(rows):
+    with rollup_lock:
+        for row in rows:
+            add_rollup_row(rollup_pending, row)
+        rollup_pending["rows"] += len(rows)
+        due = (
+            rollup_pending["rows"] >= ROLLUP_FLUSH_ROWS
+            or time.time() - rollup_pending["since"] >= ROLLUP_FLUSH_SECONDS
+        )
+    if due:
+        flush_rollups()
+
+
+def log_chat_rows(rows):
+    """Chat log likho aur analytics rollups update karo"""
+    if not rows:
+        return
+    log_rows("chat_logs.csv", rows, headers=CHAT_LOG_HEADERS)
+    try:
+        record_chat_rollup(rows)
+    except Exception as e:
+        print(f"Rollup error: {e}")
+
+
+def rebuild_rollups():
+    """Poori chat history replay karke rollups dobara banao"""
+    fresh = {"hourly": {}, "daily": {}, "queries": {}}
+    total = 0
+    for row in read_log_rows(CHAT_LOG):
+        add_rollup_row(fresh, [row.get(h) or "" for h in CHAT_LOG_HEADERS])
+        total += 1
+
+    data = {
+        "fields": ROLLUP_FIELDS,
+        "hourly": {k: list(v) for k, v in fresh["hourly"].items()},
+        "daily": {k: list(v) for k, v in fresh["daily"].items()},
+        "queries": fresh["queries"],
+    }
+    prune_rollups(data)
+    with log_lock(ROLLUP_DB):
+        save_rollups(data)
+    return total
+
+
+def describe_rollup_bucket(key, values):
+    total, unknown = values[0], values[1]
+    return {
+        "key": key,
+        "total": total,
+        "unknown": unknown,
+        "unknown_rate": round(unknown / total, 3) if total else 0,
+        "intents": {
+            name: values[ROLLUP_INDEX[f"intent:{name}"]]
+            for name in CHAT_INTENTS
+            if values[ROLLUP_INDEX[f"intent:{name}"]]
+        },
+        "user_agents": {
+            name: values[ROLLUP_INDEX[f"ua:{name}"]]
+            for name in UA_FAMILIES
+            if values[ROLLUP_INDEX[f"ua:{name}"]]
+        },
+    }
+
+
+course_index = {"version": None, "exact": {}}
+
+
+def get_course_index():
+    """Lowercase course naam -> (category, naam, info); data version par rebuild"""
+    version = college_section_version(*COURSE_SECTIONS)
+    if course_index["version"] != version:
+        exact = {}
+        for cat in COURSE_SECTIONS:
+            for name, info in college_info.get(cat, {}).items():
+                exact.setdefault(name.lower(), (cat, name, info))
+        course_index.update(version=version, exact=exact)
+    return course_index["exact"]
+
+
+# ---------- FEE INDEX (range / cheapest queries) ----------
+# Fees JSON me display string hain ("₹18,500/year"). Load par inhe rupees per
+# year aur duration ko months me badal kar har category ki sorted list banti
+# hai; "20000 se kam" ya "cheapest PG" bisect se nikalte hain. Course index
+# ki tarah section version badle to rebuild.
+FEE_CATEGORIES = {"ug": "ug_courses", "pg": "pg_courses", "diploma": "diploma_courses"}
+FEE_PERIODS = {"month": 12, "sem": 2, "semester": 2}
+FEE_AMOUNT_RE = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(k|lakhs?|lacs?)?\b", re.I)
+FEE_MULTIPLIERS = {"k": 1000, "lakh": 100000, "lac": 100000}
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(year|yr|month)", re.I)
+
+fee_index = {"version": None, "categories": {}}
+
+
+def parse_fee(text):
+    """"₹18,500/year" -> 18500, "₹1.5 lakh/year" -> 150000; warna None"""
+    match = FEE_AMOUNT_RE.search(str(text or ""))
+    if not match:
+        return None
+    unit = (match.group(2) or "").lower().rstrip("s")
+    amount = round(
+        float(match.group(1).replace(",", "")) * FEE_MULTIPLIERS.get(unit, 1)
+    )
+    period = str(text).lower().rpartition("/")[2]
+    for word, per_year in FEE_PERIODS.items():
+        if period.startswith(word):
+            return amount * per_year
+    return amount
+
+
+def parse_duration(text):
+    """"3 Years" -> 36, "6 Months" -> 6 (months me)"""
+    match = DURATION_RE.search(str(text or ""))
+    if not match:
+        return None
+    value = float(match.group(1))
+    return round(value if match.group(2).lower() == "month" else value * 12)
+
+
+def build_fee_rows(data):
+    """Category -> fee se sorted [(fee, naam, category, months)]; "all" me sab"""
+    categories = {}
+    every = []
+    for short, cat in FEE_CATEGORIES.items():
+        rows = []
+        for name, info in data.get(cat, {}).items():
+            fee = parse_fee(info.get("fee"))
+            months = parse_duration(info.get("duration"))
+            if fee is not None:
+                rows.append((fee, name, short, months))
+        rows.sort()
+        every.extend(rows)
+        categories[short] = rows
+    every.sort()
+    categories["all"] = every
+    return categories
+
+
+def get_fee_index(category="all"):
+    """Category ("all" = sab) -> (sorted fees, sorted rows). Snapshot ho to
+    sirf us category ka record padho (worker me copy nahi), warna per-worker index."""
+    snapshot = get_knowledge_snapshot()
+    if snapshot is not None:
+        record = snapshot_lookup(f"fees:{category}", snapshot)
+        rows = [tuple(row) for row in json.loads(str(record or b"[]", "utf-8"))]
+        return [row[0] for row in rows], rows
+
+    version = college_section_version(*COURSE_SECTIONS)
+    if fee_index["version"] != version:
+        categories = {
+            category: ([row[0] for row in rows], rows)
+            for category, rows in build_fee_rows(college_info).items()
+        }
+        fee_index.update(version=version, categories=categories)
+    return fee_index["categories"].get(category, ([], []))
+
+
+def courses_by_fee(category=None, min_fee=None, max_fee=None):
+    """[min_fee, max_fee] range ke courses, fee ke hisaab se sorted"""
+    fees, rows = get_fee_index(category or "all")
+    lo = 0 if min_fee is None else bisect.bisect_left(fees, min_fee)
+    hi = len(rows) if max_fee is None else bisect.bisect_right(fees, max_fee)
+    return rows[lo:hi]
+
+
+def cheapest_courses(category=None, k=1, costliest=False):
+    _, rows = get_fee_index(category or "all")
+    return rows[::-1][:k] if costliest else rows[:k]
+
+
 def find_course_by_keyword(keyword):
     k = keyword.lower().strip()
     if "ug_courses" in college_info:
-        for cat in ["ug_courses", "pg_courses", "diploma_courses"]:
-            if cat in college_info:
-                for name, info in college_info[cat].items():
-                    if k == name.lower():
-                        return cat, name, info
+        snapshot = get_knowledge_snapshot()
+        if snapshot is not None:
+            # record sirf "category<TAB>naam"; info college_info se (copy nahi)
+            record = snapshot_lookup(f"course:{k}", snapshot)
+            exact = None
+            if record is not None:
+                cat, _, name = str(record, "utf-8").partition("\t")
+                info = college_info.get(cat, {}).get(name)
+                exact = (cat, name, info) if info else None
+        else:
+            exact = get_course_index().get(k)
+        if exact:
+            return exact
         for cat in ["ug_courses", "pg_courses", "diploma_courses"]:
             if cat in college_info:
                 for name, info in college_info[cat].items():
@@ -243,6 +1420,176 @@ def find_course_by_keyword(keyword):
     return None, None, None
 
 
+def render_course_answer(name, info, phone):
+    return (
+        f"🎯 {name}\n\n"
+        f"⏱️ Duration: {info['duration']}\n"
+        f"💰 Fees: {info['fee']}\n\n"
+        f"📖 {info['desc']}\n\n"
+        f"📞 Admission: {phone}"
+    )
+
+
+def format_course_answer(name, info):
+    """Snapshot me prebuilt card ho to wahi, warna yahin format karo"""
+    prebuilt = snapshot_lookup(f"answer:course:{name.lower()}")
+    if prebuilt is not None:
+        return str(prebuilt, "utf-8")
+    return render_course_answer(name, info, college_info["phone"])
+
+
+# ---------- KNOWLEDGE SNAPSHOT (mmap, sab workers share) ----------
+# Har save par data/knowledge.snap likha jaata hai: header, sorted entry
+# table, phir keys/values ka blob. Workers ise read-only mmap karte hain
+# (page cache me ek hi copy), lookup binary search se hota hai.
+# Snapshot valid ho to derived data - course lookup table, fee index,
+# prebuilt course/facility jawab aur API bodies - workers me nahi banta;
+# course_index/fee_index/api_body_cache khaali rehte hain. college_info khud
+# har worker me rehta hai (templates aur baaki chain use karti hai); woh
+# --preload me master me load hokar fork ke baad COW share hota hai, to
+# worker RSS sirf admin edit ke baad badhta hai.
+# File badli hai ya nahi, yeh har lookup par nahi - SNAPSHOT_CHECK_SECONDS me
+# ek baar stat hota hai (is worker ka apna save turant dikh jaata hai).
+KNOWLEDGE_SNAPSHOT = os.path.join("data", "knowledge.snap")
+SNAPSHOT_MAGIC = b"SAIKB002"
+SNAPSHOT_HEADER = struct.Struct("<8sI32s")  # magic, entries, source data version
+SNAPSHOT_ENTRY = struct.Struct("<IIII")  # key offset/len, value offset/len
+SNAPSHOT_CHECK_SECONDS = 1.0
+
+knowledge_snapshot = {"stamp": None, "snapshot": None, "checked": 0, "valid": None}
+
+
+def build_knowledge_records(data):
+    """Snapshot ke key -> value (str) records"""
+    records = {}
+    for cat in ["ug_courses", "pg_courses", "diploma_courses"]:
+        for name, info in data.get(cat, {}).items():
+            key = name.lower()
+            if f"course:{key}" in records:
+                continue
+            records[f"course:{key}"] = f"{cat}\t{name}"
+            records[f"answer:course:{key}"] = render_course_answer(
+                name, info, data.get("phone", "")
+            )
+
+    for category, rows in build_fee_rows(data).items():
+        records[f"fees:{category}"] = json.dumps(rows, ensure_ascii=False)
+    for key, text in data.get("facilities", {}).items():
+        if key in FACILITY_HEADINGS:
+            records[f"answer:facility:{key}"] = render_facility_answer(key, text)
+
+    for name, (payload, _) in API_PAYLOADS.items():
+        body = app.json.dumps(payload(data)) + "\n"
+        records[f"api:{name}"] = body
+        records[f"etag:api:{name}"] = hashlib.sha1(body.encode("utf-8")).hexdigest()
+    return records
+
+
+def write_knowledge_snapshot(data):
+    """College data ka immutable binary snapshot (temp file + os.replace)"""
+    try:
+        records = sorted(
+            (key.encode("utf-8"), value.encode("utf-8"))
+            for key, value in build_knowledge_records(data).items()
+        )
+    except (KeyError, TypeError) as e:
+        print(f"Snapshot build skipped: {e}")
+        return False
+
+    offset = SNAPSHOT_HEADER.size + SNAPSHOT_ENTRY.size * len(records)
+    table, blob = [], []
+    for key, value in records:
+        table.append(
+            SNAPSHOT_ENTRY.pack(offset, len(key), offset + len(key), len(value))
+        )
+        blob.extend((key, value))
+        offset += len(key) + len(value)
+
+    header = SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, len(records), data_version(DATA_FILE).encode("ascii")
+    )
+    tmp_path = KNOWLEDGE_SNAPSHOT + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            f.writelines(table)
+            f.writelines(blob)
+        os.replace(tmp_path, KNOWLEDGE_SNAPSHOT)
+        knowledge_snapshot["checked"] = 0  # is worker me agli lookup naya dekhe
+        return True
+    except OSError as e:
+        print(f"Snapshot write error: {e}")
+        return False
+
+
+def get_knowledge_snapshot():
+    """Current mapping; snapshot file college_data.json se purani ho to None"""
+    now = time.monotonic()
+    if now - knowledge_snapshot["checked"] < SNAPSHOT_CHECK_SECONDS:
+        return knowledge_snapshot["valid"]
+    knowledge_snapshot["checked"] = now
+
+    stamp = data_version(KNOWLEDGE_SNAPSHOT)
+    if knowledge_snapshot["stamp"] != stamp:
+        snapshot = None
+        try:
+            with open(KNOWLEDGE_SNAPSHOT, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count, source = SNAPSHOT_HEADER.unpack_from(mm, 0)
+            if magic == SNAPSHOT_MAGIC:
+                snapshot = {
+                    "view": memoryview(mm),
+                    "count": count,
+                    "source": source.rstrip(b"\0").decode("ascii"),
+                }
+        except (OSError, ValueError, struct.error):
+            pass
+        # purana mmap GC hone par unmap hoga (memoryviews abhi use me ho sakte hain)
+        knowledge_snapshot.update(stamp=stamp, snapshot=snapshot)
+
+    snapshot = knowledge_snapshot["snapshot"]
+    if snapshot is None or snapshot["source"] != data_version(DATA_FILE):
+        snapshot = None
+    elif knowledge_snapshot["valid"] is not snapshot:
+        # snapshot serve kar raha hai - per-worker derived copies chhod do
+        course_index.update(version=None, exact={})
+        fee_index.update(version=None, categories={})
+        api_body_cache.clear()
+    knowledge_snapshot["valid"] = snapshot
+    return snapshot
+
+
+def snapshot_lookup(key, snapshot=None):
+    """Binary search; value ka zero-copy memoryview ya None"""
+    snapshot = snapshot or get_knowledge_snapshot()
+    if snapshot is None:
+        return None
+
+    view = snapshot["view"]
+    target = key.encode("utf-8")
+    lo, hi = 0, snapshot["count"]
+    while lo < hi:
+        mid = (lo + hi) // 2
+        key_off, key_len, value_off, value_len = SNAPSHOT_ENTRY.unpack_from(
+            view, SNAPSHOT_HEADER.size + mid * SNAPSHOT_ENTRY.size
+        )
+        current = view[key_off : key_off + key_len]
+        if current == target:
+            return view[value_off : value_off + value_len]
+        if current.tobytes() < target:
+            lo = mid + 1
+        else:
+            hi = mid
+    return None
+
+
+def ensure_knowledge_snapshot():
+    """Startup par snapshot purana/missing ho to dobara likho"""
+    if get_knowledge_snapshot() is None and college_info:
+        write_knowledge_snapshot(college_info)
+    return get_knowledge_snapshot()
+
+
 def correct_spelling(query):
     common_keywords = [
         "courses",
@@ -302,44 +1649,456 @@ def correct_spelling(query):
     return query, None
 
 
-def get_response(user_input):
+# ---------- RETRIEVAL FALLBACK (TF-IDF, char n-grams) ----------
+# Jab koi keyword branch match na ho, tab college data se sabse milta-julta
+# jawab dhoondo. Sparse vectors dict me hain; inverted index par ek pass =
+# matrix-vector product.
+RETRIEVAL_THRESHOLD = 0.18
+RETRIEVAL_NGRAMS = (3, 4)
+
+# Policy jawab get_response ke andar hain, isliye canonical query se nikalte hain
+RETRIEVAL_TOPICS = {
+    "admission": "admission process apply eligibility documents pravesh form",
+    "last date": "admission last date deadline kab tak form closing",
+    "semester": "semester system yearly annual exam system kitne semester",
+    "attendance": "attendance policy hazri present absent 75 percent condonation",
+    "marks distribution": "exam pattern paper marks distribution theory practical",
+    "scholarship": "scholarship chhatravriti concession financial help merit",
+    "placement": "placement job career companies package internship training",
+    "contact": "contact phone number mobile email website address location",
+    "about": "about college recognition accreditation naac university",
+    "principal": "principal head pracharya",
+    "director": "director chairman owner management",
+}
+
+retrieval_lock = threading.RLock()
+retrieval_index = {
+    "key": None,
+    "building": False,
+    "answers": [],
+    "postings": {},
+    "idf": {},
+    "tf_cache": {},
+}
+
+
+def char_ngrams(text):
+    """Text ke character n-gram counts (sublinear tf)"""
+    words = re.findall(r"\w+", (text or "").lower())
+    padded = " " + " ".join(words) + " "
+    counts = {}
+    for n in range(RETRIEVAL_NGRAMS[0], RETRIEVAL_NGRAMS[1] + 1):
+        for i in range(len(padded) - n + 1):
+            gram = padded[i : i + n]
+            counts[gram] = counts.get(gram, 0) + 1
+    return {gram: 1 + math.log(c) for gram, c in counts.items()}
+
+
+def build_retrieval_corpus():
+    """Facilities, courses, policies aur learned answers se (text, answer) list"""
+    docs = []
+
+    for key, text in college_info.get("facilities", {}).items():
+        docs.append(
+            (f"{key} facility {text}", f"🏫 **{key.upper()} FACILITY:**\n\n{text}")
+        )
+
+    for cat in ["ug_courses", "pg_courses", "diploma_courses"]:
+        for name, info in college_info.get(cat, {}).items():
+            docs.append(
+                (f"{name} course {info.get('desc', '')}", format_course_answer(name, info))
+            )
+
+    for canonical, text in RETRIEVAL_TOPICS.items():
+        answer = get_response(canonical, language="English")
+        docs.append((f"{text} {answer}", answer))
+
+    for item in load_learned_answers():
+        if item.get("query") and item.get("answer"):
+            docs.append((item["query"], item["answer"]))
+
+    return docs
+
+
+def refresh_retrieval_index():
+    """Data version badla ho to index dobara banao; purane docs ke n-grams reuse"""
+    key = (college_data_version(), data_version(LEARNED_ANSWERS_DB))
+    if retrieval_index["key"] == key:
+        return
+
+    with retrieval_lock:
+        if retrieval_index["key"] == key or retrieval_index["building"]:
+            return
+        retrieval_index["building"] = True
+        try:
+            docs = build_retrieval_corpus()
+
+            old_cache = retrieval_index["tf_cache"]
+            tf_cache = {}
+            for text, _ in docs:
+                tf_cache[text] = old_cache.get(text) or char_ngrams(text)
+
+            df = {}
+            for text, _ in docs:
+                for gram in tf_cache[text]:
+                    df[gram] = df.get(gram, 0) + 1
+
+            n_docs = len(docs)
+            idf = {gram: math.log((1 + n_docs) / (1 + d)) + 1 for gram, d in df.items()}
+
+            postings = {}
+            for doc_id, (text, _) in enumerate(docs):
+                tf = tf_cache[text]
+                weights = {gram: w * idf[gram] for gram, w in tf.items()}
+                norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+                for gram, w in weights.items():
+                    postings.setdefault(gram, []).append((doc_id, w / norm))
+
+            retrieval_index.update(
+                key=key,
+                answers=[answer for _, answer in docs],
+                postings=postings,
+                idf=idf,
+                tf_cache=tf_cache,
+            )
+        except Exception as e:
+            print(f"Retrieval index error: {e}")
+        finally:
+            retrieval_index["building"] = False
+
+
+def retrieve_answer(query):
+    """Sabse milta jawab, agar score threshold se upar ho"""
+    refresh_retrieval_index()
+    if retrieval_index["building"] or not retrieval_index["answers"]:
+        return None
+
+    idf = retrieval_index["idf"]
+    # corpus me na mile n-gram ko max idf do, taki anjaan query ka score gire
+    unseen_idf = math.log(1 + len(retrieval_index["answers"])) + 1
+    weights = {
+        gram: w * idf.get(gram, unseen_idf) for gram, w in char_ngrams(query).items()
+    }
+    if not weights:
+        return None
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+
+    postings = retrieval_index["postings"]
+    scores = {}
+    for gram, qw in weights.items():
+        for doc_id, dw in postings.get(gram, ()):
+            scores[doc_id] = scores.get(doc_id, 0.0) + qw * dw
+
+    if not scores:
+        return None
+    best = max(scores, key=scores.get)
+    if scores[best] / norm < RETRIEVAL_THRESHOLD:
+        return None
+    return retrieval_index["answers"][best]
+
+
+COURSE_KEYWORDS = {
+    "bca": "BCA",
+    "bba": "BBA",
+    "b.com": "B.Com",
+    "bcom": "B.Com",
+    "bsc biotech": "BSc Biotech",
+    "biotech": "BSc Biotech",
+    "biotechnology": "BSc Biotech",
+    "bsc cs": "BSc CS",
+    "bsc computer": "BSc CS",
+    "computer science": "BSc CS",
+    "bsc maths": "BSc Maths/Bio",
+    "bsc bio": "BSc Maths/Bio",
+    "bachelor of arts": "BA",
+    "msc biotech": "MSc Biotech",
+    "msc cs": "MSc CS",
+    "msc computer": "MSc CS",
+    "msc chemistry": "MSc Chemistry",
+    "m.com": "M.Com",
+    "mcom": "M.Com",
+    "m.lib": "M.Lib. (ISc)",
+    "mlib": "M.Lib. (ISc)",
+    "library science": "M.Lib. (ISc)",
+    "m.a": "M.A. (English)",
+    "ma english": "M.A. (English)",
+    "dca": "DCA",
+    "pgdca": "PGDCA",
+}
+
+
+# ---------- MULTI-INTENT ("bca fees and hostel") ----------
+# Ek query me kai topic ho sakte hain. Tokens ke n-grams ek dict me bana kar
+# har intent ki phrase ek lookup se match hoti hai (substring scan nahi).
+# Lambi phrase pehle match hoti hai aur apne words le leti hai, isliye
+# "msc biotech" me "biotech" alag course nahi banta. Do ya zyada intent hon
+# to specificity (course > facility > topic) aur hits se rank karke top
+# MULTI_INTENT_LIMIT jawab jodo; ek hi intent ho to purana chain chalega.
+MULTI_INTENT_LIMIT = 3
+INTENT_SPECIFICITY = {"course": 3, "facility": 2, "topic": 1}
+FEE_WORDS = {"fee", "fees", "cost", "kitna", "kitni"}
+FACILITY_HEADINGS = {
+    "transport": "🚌 **TRANSPORT FACILITY:**",
+    "hostel": "🏠 **HOSTEL FACILITY:**",
+    "labs": "🔬 **LAB FACILITIES:**",
+    "library": "📚 **LIBRARY FACILITY:**",
+    "sports": "⚽ **SPORTS FACILITIES:**",
+    "incubation": "🏭 **INCUBATION CENTRE:**",
+}
+FACILITY_KEYWORDS = {
+    "transport": ["transport", "bus", "vehicle", "gadi", "van", "aana jaana"],
+    "hostel": ["hostel", "accommodation", "rehne"],
+    "labs": ["lab", "labs", "laboratory", "wifi", "internet"],
+    "library": ["library", "pustakalaya", "e-library", "books"],
+    "sports": ["sports", "sport", "games", "khel", "cricket", "football"],
+    "incubation": ["incubation", "kalakriti", "entrepreneur"],
+}
+# Topic ka jawab isi canonical query se answer_query deta hai. "chahiye",
+# "bare" jaise aam words yahan nahi - woh har doosri query me aate hain.
+TOPIC_KEYWORDS = {
+    "last date": ["last date", "deadline", "kab tak"],
+    "admission": ["admission", "apply", "eligibility", "documents", "pravesh"],
+    "syllabus": ["syllabus", "curriculum"],
+    "scholarship": ["scholarship", "chhatravriti", "concession"],
+    "placement": ["placement", "placements", "job", "career", "companies"],
+    "attendance": ["attendance", "hazri"],
+    "contact": ["contact", "phone", "mobile", "email", "address", "sampark"],
+    "principal": ["principal", "pracharya"],
+    "director": ["director", "chairman"],
+}
+# pehla intent ho to doosra mat dikhao ("admission last date" = sirf date)
+INTENT_COVERS = {("topic", "last date"): ("topic", "admission")}
+
+
+def build_intent_phrases():
+    """(phrase, words, intent) list - lambi phrase aur specific intent pehle"""
+    phrases = [
+        (keyword, ("course", course))
+        for keyword, course in dict(
+            COURSE_KEYWORDS, **{"ba": "BA", "pg dca": "PGDCA"}
+        ).items()
+    ]
+    for kind, table in (("facility", FACILITY_KEYWORDS), ("topic", TOPIC_KEYWORDS)):
+        for name, keywords in table.items():
+            phrases.extend((keyword, (kind, name)) for keyword in keywords)
+    rows = [(phrase, len(phrase.split()), intent) for phrase, intent in phrases]
+    rows.sort(key=lambda row: (-row[1], -INTENT_SPECIFICITY[row[2][0]]))
+    return rows
+
+
+INTENT_PHRASES = build_intent_phrases()
+INTENT_MAX_WORDS = max(words for _, words, _ in INTENT_PHRASES)
+
+
+def query_ngrams(words):
+    """Har 1..INTENT_MAX_WORDS word n-gram -> pehli position"""
+    grams = {}
+    for n in range(1, INTENT_MAX_WORDS + 1):
+        for i in range(len(words) - n + 1):
+            grams.setdefault(" ".join(words[i : i + n]), i)
+    return grams
+
+
+def score_intents(query):
+    """Ranked intents [(kind, name)] aur fee pucha gaya ya nahi"""
+    words = [w.strip(".,!?()[]/") for w in query.split()]
+    words = [w for w in words if w]
+    grams = query_ngrams(words)
+
+    used = set()
+    scores = {}  # intent -> [specificity, matched words, first position]
+    for phrase, size, intent in INTENT_PHRASES:
+        start = grams.get(phrase)
+        if start is None:
+            continue
+        span = set(range(start, start + size))
+        if span & used:
+            continue
+        used |= span
+        score = scores.setdefault(intent, [INTENT_SPECIFICITY[intent[0]], 0, start])
+        score[1] += size
+        score[2] = min(score[2], start)
+
+    for covering, covered in INTENT_COVERS.items():
+        if covering in scores:
+            scores.pop(covered, None)
+
+    ranked = sorted(scores, key=lambda i: (-scores[i][0], -scores[i][1], scores[i][2]))
+    return ranked, bool(FEE_WORDS & set(words))
+
+
+def render_facility_answer(key, text):
+    return f"{FACILITY_HEADINGS[key]}\n\n{text}"
+
+
+def facility_answer(key):
+    prebuilt = snapshot_lookup(f"answer:facility:{key}")
+    if prebuilt is not None:
+        return str(prebuilt, "utf-8")
+    return render_facility_answer(key, college_info["facilities"][key])
+
+
+def intent_answer(intent, fee, language):
+    kind, name = intent
+    if kind == "course":
+        _, course, info = find_course_by_keyword(name)
+        if not info:
+            return None
+        if fee:
+            return f"💰 {course}: {info['fee']} ({info['duration']})"
+        return format_course_answer(course, info)
+    if kind == "facility":
+        return facility_answer(name)
+    return answer_query(name, language)
+
+
+def answer_multi_intent(query, language):
+    """2+ intent wali query ka combined jawab, warna None"""
+    ranked, fee = score_intents(query)
+    if len(ranked) < 2:
+        return None
+    answers = []
+    for intent in ranked[:MULTI_INTENT_LIMIT]:
+        answer = intent_answer(intent, fee, language)
+        if answer:
+            answers.append(answer)
+    if len(answers) < 2:
+        return None
+    return "\n\n➖➖➖➖➖\n\n".join(answers)
+
+
+# "courses with fees under 20000", "pg fees 1.5 lakh se kam", "cheapest diploma
+# course". Limit sirf tab jab fee word (fees/₹/rupees) ho, ya course/category ke
+# saath comparison word ("courses under 20000"): "2026 tak" ya "under 2 years"
+# fee nahi hai, aur saal / year-month wale number chhod do.
+FEE_LIMIT_WORDS = {
+    "under": "max",
+    "below": "max",
+    "less than": "max",
+    "upto": "max",
+    "up to": "max",
+    "within": "max",
+    "above": "min",
+    "over": "min",
+    "more than": "min",
+    "se kam": "max",
+    "tak": "max",
+    "ke andar": "max",
+    "se zyada": "min",
+    "se jyada": "min",
+    "se upar": "min",
+}
+_FEE_AMOUNT = (
+    r"(?:rs\.?|₹)?\s*(\d[\d,]*(?:\.\d+)?\s*(?:k|lakhs?|lacs?)?)\b"
+    r"(?!\s*(?:years?|yrs?|months?|mahine|sem(?:ester)?s?|saal)\b)"
+)
+_FEE_PREFIX = "under|below|less than|upto|up to|within|above|over|more than"
+_FEE_SUFFIX = "se kam|tak|ke andar|se zyada|se jyada|se upar"
+FEE_LIMIT_RES = [
+    re.compile(rf"\b({_FEE_PREFIX})\s*{_FEE_AMOUNT}"),
+    re.compile(rf"{_FEE_AMOUNT}\s*(?:rs|rupees|₹)?\s*({_FEE_SUFFIX})\b"),
+]
+FEE_BETWEEN_RE = re.compile(
+    rf"\bbetween\s*{_FEE_AMOUNT}\s*(?:and|to|-)\s*{_FEE_AMOUNT}"
+)
+FEE_COMPARE_RE = re.compile(rf"\b(?:between|{_FEE_PREFIX}|{_FEE_SUFFIX})\b")
+FEE_LIMIT_CONTEXT = {"fee", "fees", "rupees", "rs", "rs."}
+CHEAPEST_WORDS = {"cheapest", "sasta", "sasti", "lowest", "cheap"}
+COSTLIEST_WORDS = {"costliest", "mehnga", "mehenga", "mehngi", "highest", "expensive"}
+
+
+def fee_query_limits(query):
+    """Query se (min_fee, max_fee); koi limit na ho to (None, None)"""
+    limits = {"min": None, "max": None}
+    for i, pattern in enumerate(FEE_LIMIT_RES):
+        for match in pattern.finditer(query):
+            word, amount = match.groups() if i == 0 else match.groups()[::-1]
+            amount = amount.replace(" ", "")
+            if re.fullmatch(r"(19|20)\d\d", amount):
+                continue  # "2026 tak" saal hai, fee nahi
+            limits[FEE_LIMIT_WORDS[word]] = parse_fee(amount)
+    for match in FEE_BETWEEN_RE.finditer(query):
+        low, high = (amount.replace(" ", "") for amount in match.groups())
+        if not any(re.fullmatch(r"(19|20)\d\d", a) for a in (low, high)):
+            limits["min"], limits["max"] = parse_fee(low), parse_fee(high)
+    return limits["min"], limits["max"]
+
+
+def fee_limit_context(query, tokens, category=None):
+    """Query ke number fee limit hain ya nahi.
+
+    >>> fee_limit_context("courses under 20000", {"courses", "under", "20000"})
+    True
+    >>> fee_limit_context("kya admission 2026 tak open hai", {"admission", "tak"})
+    False
+    """
+    if tokens & FEE_LIMIT_CONTEXT or "₹" in query:
+        return True
+    course_words = tokens & {"course", "courses"} or category
+    return bool(course_words and FEE_COMPARE_RE.search(query))
+
+
+def format_fee_rows(title, rows):
+    text = f"💰 **{title}:**\n\n"
+    for _, name, short, _ in rows:
+        info = college_info[FEE_CATEGORIES[short]][name]
+        text += f"🎓 {name} ({short.upper()}): {info['fee']} ({info['duration']})\n"
+    return text + "\n💡 Kisi bhi course ka naam type karein full details ke liye."
+
+
+def answer_fee_query(query, tokens):
+    """Fee range / cheapest / costliest wale sawal, warna None"""
+    # "bca fees under 30000" / "hostel fees" - naam wala course/facility jawab de
+    intents, _ = score_intents(query)
+    if any(kind in ("course", "facility") for kind, _ in intents):
+        return None
+
+    category = next((c for c in FEE_CATEGORIES if c in tokens), None)
+    label = f"{category.upper()} courses" if category else "Courses"
+    fee_context = bool(
+        tokens & (FEE_WORDS | {"course", "courses"}) or category or "₹" in query
+    )
+
+    min_fee, max_fee = (None, None)
+    if fee_limit_context(query, tokens, category):
+        min_fee, max_fee = fee_query_limits(query)
+    if min_fee is not None or max_fee is not None:
+        rows = courses_by_fee(category, min_fee, max_fee)
+        if min_fee is not None and max_fee is not None:
+            title = f"{label} between ₹{min_fee:,} and ₹{max_fee:,}/year"
+        elif max_fee is not None:
+            title = f"{label} under ₹{max_fee:,}/year"
+        else:
+            title = f"{label} above ₹{min_fee:,}/year"
+        if not rows:
+            return (
+                f"😕 {title}: is range me koi course nahi mila.\n\n"
+                "💡 'Cheapest course' ya 'courses with fees under 25000' try karein."
+            )
+        return format_fee_rows(title, rows)
+
+    cheapest = tokens & CHEAPEST_WORDS
+    costliest = tokens & COSTLIEST_WORDS
+    if (cheapest or costliest) and fee_context:
+        top = re.search(r"\btop\s+(\d+)", query)
+        k = int(top.group(1)) if top else 3
+        rows = cheapest_courses(category, k, costliest=bool(costliest and not cheapest))
+        if not rows:
+            return None
+        word = "Cheapest" if cheapest else "Costliest"
+        return format_fee_rows(f"{word} {label}", rows)
+    return None
+
+
+def answer_query(user_input, language=None):
     try:
         query = (user_input or "").lower().strip()
-        current_lang = session.get("language", "Hinglish")
+        current_lang = language or session.get("language", "Hinglish")
 
         corrected_query, suggestion = correct_spelling(query)
         if suggestion:
             query = corrected_query
 
-        course_keywords = {
-            "bca": "BCA",
-            "bba": "BBA",
-            "b.com": "B.Com",
-            "bcom": "B.Com",
-            "bsc biotech": "BSc Biotech",
-            "biotech": "BSc Biotech",
-            "biotechnology": "BSc Biotech",
-            "bsc cs": "BSc CS",
-            "bsc computer": "BSc CS",
-            "computer science": "BSc CS",
-            "bsc maths": "BSc Maths/Bio",
-            "bsc bio": "BSc Maths/Bio",
-            "bachelor of arts": "BA",
-            "msc biotech": "MSc Biotech",
-            "msc cs": "MSc CS",
-            "msc computer": "MSc CS",
-            "msc chemistry": "MSc Chemistry",
-            "m.com": "M.Com",
-            "mcom": "M.Com",
-            "m.lib": "M.Lib. (ISc)",
-            "mlib": "M.Lib. (ISc)",
-            "library science": "M.Lib. (ISc)",
-            "m.a": "M.A. (English)",
-            "ma english": "M.A. (English)",
-            "dca": "DCA",
-            "pgdca": "PGDCA",
-        }
-
         tokens = set([w.strip(".,!?()[]/") for w in query.split() if w.strip()])
 
         if any(
@@ -356,6 +2115,14 @@ def get_response(user_input):
         if any(w in tokens for w in ["thank", "thanks", "dhanyawad", "shukriya"]):
             return "😊 Aapka swagat hai! Kuch aur poochh sakte ho."
 
+        fee_answer = answer_fee_query(query, tokens)
+        if fee_answer:
+            return fee_answer
+
+        combined = answer_multi_intent(query, current_lang)
+        if combined:
+            return combined
+
         if any(w in query for w in ["principal", "head", "pracharya"]):
             return (
                 f"👩🏫 **Principal:** {college_info['principal']['name']}\n"
@@ -385,16 +2152,16 @@ def get_response(user_input):
             word in query
             for word in ["transport", "bus", "vehicle", "gadi", "van", "aana jaana"]
         ):
-            return f"🚌 **TRANSPORT FACILITY:**\n\n{college_info['facilities']['transport']}"
+            return facility_answer("transport")
 
         if any(word in query for word in ["hostel", "accommodation", "stay", "rehne"]):
-            return f"🏠 **HOSTEL FACILITY:**\n\n{college_info['facilities']['hostel']}"
+            return facility_answer("hostel")
 
         if any(
             word in query
             for word in ["lab", "laboratory", "computer", "internet", "wifi"]
         ):
-            return f"🔬 **LAB FACILITIES:**\n\n{college_info['facilities']['labs']}"
+            return facility_answer("labs")
 
         if any(
             word in query
@@ -407,20 +2174,16 @@ def get_response(user_input):
                 "reading",
             ]
         ):
-            return (
-                f"📚 **LIBRARY FACILITY:**\n\n{college_info['facilities']['library']}"
-            )
+            return facility_answer("library")
 
         if any(
             word in query
             for word in ["sports", "sport", "games", "khel", "cricket", "football"]
         ):
-            return (
-                f"⚽ **SPORTS FACILITIES:**\n\n{college_info['facilities']['sports']}"
-            )
+            return facility_answer("sports")
 
         if any(word in query for word in ["incubation", "kalakriti", "entrepreneur"]):
-            return f"🏭 **INCUBATION CENTRE:**\n\n{college_info['facilities']['incubation']}"
+            return facility_answer("incubation")
 
         facilities_keywords = ["facilities", "facility", "suvidha", "infrastructure"]
         if any(keyword in query for keyword in facilities_keywords) and "all" in query:
@@ -481,24 +2244,12 @@ def get_response(user_input):
         if "msc" in query and "biotech" in query:
             cat, name, info = find_course_by_keyword("MSc Biotech")
             if info:
-                return (
-                    f"🎯 {name}\n\n"
-                    f"⏱️ Duration: {info['duration']}\n"
-                    f"💰 Fees: {info['fee']}\n\n"
-                    f"📖 {info['desc']}\n\n"
-                    f"📞 Admission: {college_info['phone']}"
-                )
+                return format_course_answer(name, info)
 
         if "pg" in query and "dca" in query:
             cat, name, info = find_course_by_keyword("PGDCA")
             if info:
-                return (
-                    f"🎯 {name}\n\n"
-                    f"⏱️ Duration: {info['duration']}\n"
-                    f"💰 Fees: {info['fee']}\n\n"
-                    f"📖 {info['desc']}\n\n"
-                    f"📞 Admission: {college_info['phone']}"
-                )
+                return format_course_answer(name, info)
 
         if (
             query == "ba"
@@ -507,39 +2258,27 @@ def get_response(user_input):
         ):
             cat, name, info = find_course_by_keyword("BA")
             if info:
-                return (
-                    f"🎯 {name}\n\n"
-                    f"⏱️ Duration: {info['duration']}\n"
-                    f"💰 Fees: {info['fee']}\n\n"
-                    f"📖 {info['desc']}\n\n"
-                    f"📞 Admission: {college_info['phone']}"
-                )
+                return format_course_answer(name, info)
 
-        for keyword, course_name in course_keywords.items():
+        for keyword, course_name in COURSE_KEYWORDS.items():
             if keyword in query and "incubation" not in query:
                 cat, name, info = find_course_by_keyword(course_name)
                 if info:
-                    return (
-                        f"🎯 {name}\n\n"
-                        f"⏱️ Duration: {info['duration']}\n"
-                        f"💰 Fees: {info['fee']}\n\n"
-                        f"📖 {info['desc']}\n\n"
-                        f"📞 Admission: {college_info['phone']}"
-                    )
+                    return format_course_answer(name, info)
 
         if any(word in query for word in ["hostel", "accommodation", "stay", "rehne"]):
-            return f"🏠 **HOSTEL FACILITY:**\n\n{college_info['facilities']['hostel']}"
+            return facility_answer("hostel")
 
         if any(
             word in tokens for word in ["transport", "bus", "vehicle", "gadi", "van"]
         ):
-            return f"🚌 **TRANSPORT FACILITY:**\n\n{college_info['facilities']['transport']}"
+            return facility_answer("transport")
 
         if any(word in query for word in ["lab", "laboratory", "computer"]):
-            return f"🔬 **LAB FACILITIES:**\n\n{college_info['facilities']['labs']}"
+            return facility_answer("labs")
 
         if "fee" in query or "fees" in query or "cost" in query or "kitna" in query:
-            for keyword, course_name in course_keywords.items():
+            for keyword, course_name in COURSE_KEYWORDS.items():
                 if keyword in query:
                     cat, name, info = find_course_by_keyword(course_name)
                     if info:
@@ -768,11 +2507,16 @@ def get_response(user_input):
         if "photo" in query or "gallery" in query or "image" in query:
             return "📸 Gallery opening... Please wait!"
 
+        retrieved = retrieve_answer(query)
+        if retrieved:
+            return retrieved
+
         log_data(
             "unknown_queries.csv",
             [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_input, "pending"],
             headers=["timestamp", "query", "status"],
         )
+        publish_admin_event("unknown_query", query=(user_input or "")[:200])
 
         if suggestion:
             return (
@@ -798,9 +2542,398 @@ def get_response(user_input):
         return "⚠️ Internal Error. Please try again."
 
 
+# ---------- CONVERSATION CONTEXT (follow-up questions) ----------
+# "BCA" ke baad "fees kitna?" ko BCA ka sawal samajhna hai. Cookie me sirf
+# chhota session["cid"] jaata hai; last course + intent ek fixed size mmap
+# file me rehte hain (rate limiter jaisa), taki saare workers same context
+# dekhein. TTL ke baad entry expire, slot full ho to sabse purana (LRU) hatao.
+CONTEXT_DB = os.path.join("data", "conversation_context.bin")
+CONTEXT_SLOTS = 8192
+CONTEXT_PROBES = 8
+CONTEXT_TTL = 30 * 60
+CONTEXT_SLOT = struct.Struct("<Qd24s24s")  # id hash, last seen, course, intent
+CONTEXT_HEADER_SIZE = 64
+CONTEXT_MAGIC = b"SAICX001"
+# Sirf course wale sawal ya course ki taraf ishara. "details", "duration",
+# "kitna" jaise aam words nahi - "hostel details" ya "bus fees kitni" apne
+# topic ke sawal hain, pichhle course ke nahi.
+FOLLOW_UP_WORDS = {"fee", "fees", "cost", "iska", "iski", "uska", "uski"}
+FOLLOW_UP_PHRASES = ["kitne saal", "is course", "ye course", "same course"]
+COURSE_CATEGORIES = ["ug", "pg", "diploma"]
+
+context_state = {"map": None, "file": None, "pid": None}
+context_lock = threading.Lock()
+
+
+def context_map():
+    size = CONTEXT_HEADER_SIZE + CONTEXT_SLOTS * CONTEXT_SLOT.size
+    return shared_slot_map(context_state, CONTEXT_DB, CONTEXT_MAGIC, size)
+
+
+def conversation_id():
+    """Session ka chhota conversation id (pehli baar me bana do)"""
+    cid = session.get("cid")
+    if not cid:
+        cid = secrets.token_urlsafe(9)
+        session["cid"] = cid
+    return cid
+
+
+def find_context_slot(mm, key_hash, now):
+    """(offset, found) - match, khaali/expired slot, warna LRU slot"""
+    start = key_hash % CONTEXT_SLOTS
+    oldest = oldest_time = None
+    for probe in range(CONTEXT_PROBES):
+        offset = CONTEXT_HEADER_SIZE + (
+            (start + probe) % CONTEXT_SLOTS
+        ) * CONTEXT_SLOT.size
+        slot_hash, last_seen, _, _ = CONTEXT_SLOT.unpack_from(mm, offset)
+        if slot_hash == key_hash:
+            return offset, now - last_seen <= CONTEXT_TTL
+        if slot_hash == 0 or now - last_seen > CONTEXT_TTL:
+            return offset, False
+        if oldest_time is None or last_seen < oldest_time:
+            oldest, oldest_time = offset, last_seen
+    return oldest, False
+
+
+def load_conversation_context(context_id):
+    now = time.time()
+    with shared_slots_locked(context_state, context_lock, context_map) as mm:
+        offset, found = find_context_slot(mm, slot_key_hash(context_id), now)
+        if not found:
+            return {"course": "", "intent": ""}
+        _, _, course, intent = CONTEXT_SLOT.unpack_from(mm, offset)
+    return {
+        "course": course.rstrip(b"\0").decode("utf-8", "ignore"),
+        "intent": intent.rstrip(b"\0").decode("utf-8", "ignore"),
+    }
+
+
+def save_conversation_context(context_id, course, intent):
+    # fixed width fields: lamba text kat jaayega, entry size kabhi nahi badhega
+    now = time.time()
+    key_hash = slot_key_hash(context_id)
+    with shared_slots_locked(context_state, context_lock, context_map) as mm:
+        offset, _ = find_context_slot(mm, key_hash, now)
+        CONTEXT_SLOT.pack_into(
+            mm,
+            offset,
+            key_hash,
+            now,
+            course.encode("utf-8")[:24],
+            intent.encode("utf-8")[:24],
+        )
+
+
+def mentioned_course(query):
+    """Query me course keyword ya category (ug/pg/diploma), warna None"""
+    for keyword in COURSE_KEYWORDS:
+        if keyword in query:
+            return keyword
+    words = set(re.findall(r"[a-z]+", query))
+    if "ba" in words:
+        return "bachelor of arts"
+    for category in COURSE_CATEGORIES:
+        if category in words:
+            return category
+    return None
+
+
+def resolve_follow_up(user_input, context):
+    """Course ke bina follow-up ("fees kitna?") me pichhla course jodo"""
+    query = (user_input or "").lower()
+    if not context["course"] or mentioned_course(query):
+        return user_input
+    # facility / topic ka apna sawal ("hostel fees kitna") - course mat jodo
+    intents, _ = score_intents(query)
+    if intents:
+        return user_input
+    words = {w.strip(".,!?()[]/") for w in query.split()}
+    if not (FOLLOW_UP_WORDS & words or any(p in query for p in FOLLOW_UP_PHRASES)):
+        return user_input
+    return f"{user_input} {context['course']}"
+
+
+def get_response(user_input, language=None, context_id=None):
+    """context_id ho to follow-up sawal pichhle course ke hisaab se"""
+    if not context_id:
+        return answer_query(user_input, language)
+
+    try:
+        context = load_conversation_context(context_id)
+    except Exception as e:
+        # context store kharab ho to bhi normal jawab do
+        print(f"Context load error: {e}")
+        return answer_query(user_input, language)
+
+    resolved = resolve_follow_up(user_input, context)
+    response = answer_query(resolved, language)
+
+    course = mentioned_course((resolved or "").lower()) or context["course"]
+    try:
+        save_conversation_context(context_id, course, classify_intent(response))
+    except Exception as e:
+        print(f"Context save error: {e}")
+    return response
+
+
+# ---------- RATE LIMITING (shared token buckets) ----------
+# /chat aur /feedback par per-IP + global token bucket. Buckets ek chhoti
+# mmap file me fixed slots (hash se) me rehte hain, isliye saare gunicorn
+# workers same state dekhte hain aur har check O(1) hai.
+RATE_LIMIT_DB = os.path.join("data", "rate_limits.bin")
+RATE_LIMIT_SLOTS = 4096
+RATE_LIMIT_PROBES = 8
+RATE_LIMIT_HEADER = struct.Struct("<8sQQQ")
+RATE_LIMIT_SLOT = struct.Struct("<Qdd")  # key hash, tokens, last refill time
+RATE_LIMIT_HEADER_SIZE = 64
+RATE_LIMIT_MAGIC = b"SAIRL001"
+
+# rate = tokens/second, burst = bucket size
+RATE_LIMITS = {
+    "chat": {"rate": 1.0, "burst": 20, "global_rate": 50.0, "global_burst": 300},
+    "feedback": {"rate": 0.05, "burst": 5, "global_rate": 2.0, "global_burst": 50},
+    "channel": {"rate": 0.1, "burst": 5, "global_rate": 5.0, "global_burst": 100},
+}
+RATE_LIMITED_ENDPOINTS = {
+    "chat": "chat",
+    "chat_batch": "chat",
+    "chat_send": "chat",
+    "feedback": "feedback",
+    "open_chat_channel": "channel",
+}
+# Campus kiosks: comma separated IPs ya CIDR, e.g. "10.0.5.0/24,192.168.1.20"
+RATE_LIMIT_ALLOWLIST = [
+    ipaddress.ip_network(item.strip(), strict=False)
+    for item in os.getenv("RATE_LIMIT_ALLOWLIST", "").split(",")
+    if item.strip()
+]
+
+# nginx / load balancer ke peeche remote_addr proxy ka IP hota hai aur sab
+# users ek hi bucket me aa jaate. PROXY_FIX_HOPS = aage kitne trusted proxies
+# hain (default 0: X-Forwarded-For par bharosa nahi, direct exposure safe).
+PROXY_FIX_HOPS = int(os.getenv("PROXY_FIX_HOPS", "0"))
+if PROXY_FIX_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_FIX_HOPS, x_proto=PROXY_FIX_HOPS)
+
+rate_limit_state = {"map": None, "file": None, "pid": None}
+rate_limit_lock = threading.Lock()
+
+
+def shared_slot_map(state, path, magic, size):
+    """Fixed size mmap file lazily kholo (fork ke baad har worker apna handle)"""
+    if state["pid"] == os.getpid():
+        return state["map"]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    f = open(path, "a+b")
+    if os.path.getsize(path) != size:
+        f.truncate(size)
+    mm = mmap.mmap(f.fileno(), size)
+    if mm[: len(magic)] != magic:
+        mm[:size] = bytes(size)
+        mm[: len(magic)] = magic
+
+    state.update(map=mm, file=f, pid=os.getpid())
+    return mm
+
+
+@contextmanager
+def shared_slots_locked(state, thread_lock, open_map):
+    with thread_lock:
+        mm = open_map()
+        if fcntl is not None:
+            fcntl.flock(state["file"], fcntl.LOCK_EX)
+        try:
+            yield mm
+        finally:
+            if fcntl is not None:
+                fcntl.flock(state["file"], fcntl.LOCK_UN)
+
+
+def slot_key_hash(key):
+    """Slot key ka 64-bit hash (0 = khaali slot, isliye kabhi 0 nahi)"""
+    return int.from_bytes(
+        hashlib.blake2b(key.encode(), digest_size=8).digest(), "little"
+    ) or 1
+
+
+def rate_limit_map():
+    size = RATE_LIMIT_HEADER_SIZE + RATE_LIMIT_SLOTS * RATE_LIMIT_SLOT.size
+    return shared_slot_map(rate_limit_state, RATE_LIMIT_DB, RATE_LIMIT_MAGIC, size)
+
+
+def rate_limit_locked():
+    return shared_slots_locked(rate_limit_state, rate_limit_lock, rate_limit_map)
+
+
+def take_tokens(mm, key, rate, burst, cost, now):
+    """Bucket se `cost` tokens lo; slot na mile to sabse purana slot reuse"""
+    key_hash = slot_key_hash(key)
+    start = key_hash % RATE_LIMIT_SLOTS
+    target = oldest = None
+    oldest_time = None
+    tokens, last = float(burst), now
+
+    for probe in range(RATE_LIMIT_PROBES):
+        offset = RATE_LIMIT_HEADER_SIZE + (
+            (start + probe) % RATE_LIMIT_SLOTS
+        ) * RATE_LIMIT_SLOT.size
+        slot_hash, slot_tokens, slot_last = RATE_LIMIT_SLOT.unpack_from(mm, offset)
+        if slot_hash == key_hash:
+            target, tokens, last = offset, slot_tokens, slot_last
+            break
+        if slot_hash == 0:
+            target = offset
+            break
+        if oldest_time is None or slot_last < oldest_time:
+            oldest, oldest_time = offset, slot_last
+    if target is None:
+        target = oldest
+
+    tokens = min(float(burst), tokens + max(now - last, 0) * rate)
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+    RATE_LIMIT_SLOT.pack_into(mm, target, key_hash, tokens, now)
+    return allowed, tokens
+
+
+def check_rate_limit(group, ip, cost=1):
+    """(allowed, retry_after) - allowlist wale IPs hamesha allowed"""
+    try:
+        address = ipaddress.ip_address(ip or "0.0.0.0")
+        if any(address in network for network in RATE_LIMIT_ALLOWLIST):
+            return True, 0
+    except ValueError:
+        pass
+
+    limits = RATE_LIMITS[group]
+    now = time.time()
+    with rate_limit_locked() as mm:
+        header = RATE_LIMIT_HEADER.unpack_from(mm, 0)
+        _, allowed_count, throttled_ip, throttled_global = header
+        ok, tokens = take_tokens(
+            mm, f"{group}:{ip}", limits["rate"], limits["burst"], cost, now
+        )
+        if not ok:
+            throttled_ip += 1
+            retry_after = (cost - tokens) / limits["rate"]
+        else:
+            ok, tokens = take_tokens(
+                mm,
+                f"{group}:*",
+                limits["global_rate"],
+                limits["global_burst"],
+                cost,
+                now,
+            )
+            if ok:
+                allowed_count += 1
+                retry_after = 0
+            else:
+                throttled_global += 1
+                retry_after = (cost - tokens) / limits["global_rate"]
+        RATE_LIMIT_HEADER.pack_into(
+            mm, 0, RATE_LIMIT_MAGIC, allowed_count, throttled_ip, throttled_global
+        )
+    return ok, retry_after
+
+
+def too_many_requests(retry_after):
+    response = jsonify({"success": False, "error": "Too many requests"})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(int(math.ceil(retry_after)), 1))
+    return response
+
+
+@app.before_request
+def apply_rate_limit():
+    group = RATE_LIMITED_ENDPOINTS.get(request.endpoint)
+    if not group or request.method != "POST":
+        return None
+    try:
+        ok, retry_after = check_rate_limit(group, request.remote_addr)
+    except Exception as e:
+        # limiter kharab ho to request rokni nahi hai
+        print(f"Rate limit error: {e}")
+        return None
+    if not ok:
+        return too_many_requests(retry_after)
+    return None
+
+
+# ---------- RENDERED PAGE CACHE ----------
+# Public pages sirf data version badalne par badalte hain. Har (page, version)
+# ka HTML ek baar render karke gzip/brotli variants ke saath rakha jaata hai
+# aur ETag/304 ke saath serve hota hai.
+PAGE_CACHE_MAX = 32
+
+page_cache = {}
+page_cache_lock = threading.Lock()
+
+
+def build_page_entry(template, context):
+    html = render_template(template, **context).encode("utf-8")
+    etag = hashlib.sha1(html).hexdigest()[:20]
+    entry = {"etag": etag, "identity": html, "gzip": gzip.compress(html, 6)}
+    if brotli is not None:
+        entry["br"] = brotli.compress(html, quality=9)
+    return entry
+
+
+def cached_page(cache_key, template, get_context, status=200):
+    """cache_key me data version hona chahiye; get_context sirf miss par chalta hai"""
+    entry = page_cache.get(cache_key)
+    if entry is None:
+        entry = build_page_entry(template, get_context())
+        with page_cache_lock:
+            # purane versions hatao taki cache bounded rahe
+            for key in [k for k in page_cache if k[0] == cache_key[0]]:
+                page_cache.pop(key)
+            while len(page_cache) >= PAGE_CACHE_MAX:
+                page_cache.pop(next(iter(page_cache)))
+            page_cache[cache_key] = entry
+
+    accepted = request.accept_encodings
+    if entry.get("br") and accepted["br"]:
+        encoding = "br"
+    elif accepted["gzip"]:
+        encoding = "gzip"
+    else:
+        encoding = "identity"
+    # "-gzip"/"-br" suffix compression_middleware lagata/hatata hai (Content-
+    # Encoding dekh kar), isliye yahan sirf base ETag
+    etag = entry["etag"]
+
+    if status == 200 and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry[encoding], status=status, mimetype="text/html")
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/csrf-token")
+def csrf_token_api():
+    response = jsonify({"csrf_token": generate_csrf()})
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
 @app.route("/")
 def home():
-    return render_template("index.html", college_info=college_info)
+    return cached_page(
+        ("index", college_data_version()),
+        "index.html",
+        lambda: {"college_info": college_info},
+    )
 
 
 @csrf.exempt
@@ -808,16 +2941,16 @@ def home():
 def chat():
     try:
         user_message = request.json.get("message", "")
-        response = get_response(user_message)
-        log_data(
-            "chat_logs.csv",
+        response = get_response(user_message, context_id=conversation_id())
+        log_chat_rows(
             [
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                user_message,
-                response[:100],
-                request.headers.get("User-Agent", "Unknown"),
-            ],
-            headers=["timestamp", "user_message", "bot_response", "user_agent"],
+                [
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    user_message,
+                    response[:100],
+                    request.headers.get("User-Agent", "Unknown"),
+                ]
+            ]
         )
         return jsonify({"response": response})
     except Exception as e:
@@ -825,6 +2958,255 @@ def chat():
         return jsonify({"response": "Something went wrong, please try again."}), 500
 
 
+# poora batch chat bucket se len(messages) tokens leta hai, isliye burst se
+# bada batch kabhi pass hi nahi hota - limit burst par hi rakho
+MAX_BATCH_MESSAGES = RATE_LIMITS["chat"]["burst"]
+MAX_BATCH_MESSAGE_LENGTH = 1000
+MAX_BATCH_BYTES = 256 * 1024
+
+
+@csrf.exempt
+@app.route("/chat/batch", methods=["POST"])
+def chat_batch():
+    """Kiosk / WhatsApp bridge ke liye ek request me kai messages"""
+    if request.content_length and request.content_length > MAX_BATCH_BYTES:
+        return jsonify({"success": False, "error": "Batch too large"}), 413
+
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get("messages"), list):
+        return jsonify({"success": False, "error": "messages list required"}), 400
+
+    messages = data["messages"]
+    if len(messages) > MAX_BATCH_MESSAGES:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "error": f"Max {MAX_BATCH_MESSAGES} messages per batch",
+                }
+            ),
+            413,
+        )
+
+    # before_request ne ek token liya; baaki messages ka hisaab yahan
+    if len(messages) > 1:
+        ok, retry_after = check_rate_limit(
+            "chat", request.remote_addr, cost=len(messages) - 1
+        )
+        if not ok:
+            return too_many_requests(retry_after)
+
+    default_lang = data.get("language") or session.get("language", "Hinglish")
+    user_agent = request.headers.get("User-Agent", "Unknown")
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    results = []
+    log_entries = []
+    for i, item in enumerate(messages):
+        # har message alag se validate, ek kharab message poora batch nahi todega
+        if isinstance(item, str):
+            item = {"message": item}
+        if not isinstance(item, dict):
+            results.append({"index": i, "error": "Invalid message"})
+            continue
+
+        text = item.get("message")
+        if not isinstance(text, str) or not text.strip():
+            results.append({"index": i, "error": "Empty message"})
+            continue
+        if len(text) > MAX_BATCH_MESSAGE_LENGTH:
+            results.append({"index": i, "error": "Message too long"})
+            continue
+
+        # batch me alag-alag users ho sakte hain (WhatsApp bridge): follow-up
+        # context sirf tab jab message apna conversation_id bheje
+        thread_id = item.get("conversation_id")
+        if isinstance(thread_id, str) and 0 < len(thread_id) <= 64:
+            context_id = f"batch:{thread_id}"
+        else:
+            context_id = None
+
+        try:
+            response = get_response(
+                text,
+                language=item.get("language") or default_lang,
+                context_id=context_id,
+            )
+        except Exception as e:
+            print(f"⚠️ Batch chat error: {e}")
+            results.append({"index": i, "error": "Something went wrong"})
+            continue
+
+        results.append({"index": i, "response": response})
+        log_entries.append([timestamp, text, response[:100], user_agent])
+
+    log_chat_rows(log_entries)
+    return jsonify({"success": True, "responses": results})
+
+
+# ---------- PERSISTENT CHAT CHANNEL (SSE + POST) ----------
+# Stream ek worker ke memory me rehta hai aur khula rehne tak ek gthread
+# thread pakadta hai. Isliye: har worker me MAX_CHAT_CHANNELS (threads ka
+# chhota hissa) se zyada stream nahi, stream CHAT_STREAM_IDLE ke baad ya
+# CHAT_STREAM_MAX_SECONDS par "end" bhej kar band ho jaata hai, aur widget
+# agle message par naya channel kholta hai. /chat/send kisi doosre worker par
+# pahunche to wahin jawab 200 me de deta hai (context session cookie me hai),
+# to multi-worker par bhi message 404 nahi hote.
+CHAT_CHANNEL_HEARTBEAT = 15
+CHAT_STREAM_IDLE = 60
+CHAT_CHANNEL_TTL = 2 * CHAT_STREAM_IDLE
+CHAT_STREAM_MAX_SECONDS = 5 * 60
+MAX_CHAT_CHANNELS = max(int(os.getenv("GUNICORN_THREADS", "16")) // 4, 1)
+MAX_CHANNEL_QUEUE = 50
+
+chat_channels = {}
+chat_channels_lock = threading.Lock()
+
+
+def end_chat_channel(channel):
+    """Stream ko band hone ka signal do"""
+    try:
+        channel["queue"].put_nowait(None)
+    except queue.Full:
+        # stream heartbeat par khud dekh lega ki channel hat chuka hai
+        pass
+
+
+def prune_chat_channels():
+    """Idle channels hatao (lock caller ke paas hona chahiye)"""
+    cutoff = time.time() - CHAT_CHANNEL_TTL
+    for channel_id in [
+        cid for cid, ch in chat_channels.items() if ch["last_seen"] < cutoff
+    ]:
+        end_chat_channel(chat_channels.pop(channel_id))
+
+
+def get_chat_channel(channel_id):
+    with chat_channels_lock:
+        channel = chat_channels.get(channel_id)
+        if channel:
+            channel["last_seen"] = time.time()
+        return channel
+
+
+@csrf.exempt
+@app.route("/chat/channel", methods=["POST"])
+def open_chat_channel():
+    data = request.get_json(silent=True) or {}
+
+    channel = {
+        "language": data.get("language") or session.get("language", "Hinglish"),
+        "user_agent": request.headers.get("User-Agent", "Unknown"),
+        "context": conversation_id(),
+        "queue": queue.Queue(maxsize=MAX_CHANNEL_QUEUE),
+        "last_seen": time.time(),
+    }
+
+    with chat_channels_lock:
+        prune_chat_channels()
+        if len(chat_channels) >= MAX_CHAT_CHANNELS:
+            return jsonify({"success": False, "error": "Server busy"}), 503
+        channel_id = secrets.token_urlsafe(16)
+        chat_channels[channel_id] = channel
+
+    return jsonify({"success": True, "channel": channel_id})
+
+
+@app.route("/chat/stream/<channel_id>")
+def chat_stream(channel_id):
+    channel = get_chat_channel(channel_id)
+    if not channel:
+        return jsonify({"error": "Channel not found"}), 404
+
+    def events():
+        started = last_event = time.time()
+        yield "retry: 3000\n\n"
+        try:
+            while True:
+                now = time.time()
+                if (
+                    now - last_event > CHAT_STREAM_IDLE
+                    or now - started > CHAT_STREAM_MAX_SECONDS
+                ):
+                    break
+                try:
+                    event = channel["queue"].get(timeout=CHAT_CHANNEL_HEARTBEAT)
+                except queue.Empty:
+                    if channel_id not in chat_channels:
+                        break
+                    yield ": ping\n\n"
+                    continue
+
+                if event is None:
+                    break
+                last_event = time.time()
+                yield f"data: {json.dumps(event)}\n\n"
+            # widget reconnect na kare, agle message par naya channel khole
+            yield "event: end\ndata: {}\n\n"
+        finally:
+            with chat_channels_lock:
+                chat_channels.pop(channel_id, None)
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@csrf.exempt
+@app.route("/chat/send/<channel_id>", methods=["POST"])
+def chat_send(channel_id):
+    channel = get_chat_channel(channel_id)
+    data = request.get_json(silent=True) or {}
+    user_message = data.get("message", "")
+    if channel and data.get("language"):
+        channel["language"] = data["language"]
+
+    if channel:
+        language, context_id = channel["language"], channel["context"]
+    else:
+        # channel doosre worker me (ya band) hai - jawab isi response me
+        language = data.get("language") or session.get("language", "Hinglish")
+        context_id = conversation_id()
+
+    try:
+        response = get_response(user_message, language=language, context_id=context_id)
+    except Exception as e:
+        print(f"⚠️ Channel chat error: {e}")
+        response = "Something went wrong, please try again."
+
+    log_chat_rows(
+        [
+            [
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                user_message,
+                response[:100],
+                request.headers.get("User-Agent", "Unknown"),
+            ]
+        ]
+    )
+
+    if not channel:
+        return jsonify({"id": data.get("id"), "response": response})
+    try:
+        channel["queue"].put_nowait({"id": data.get("id"), "response": response})
+    except queue.Full:
+        return jsonify({"error": "Channel backlog full"}), 503
+
+    return "", 202
+
+
+@csrf.exempt
+@app.route("/chat/channel/<channel_id>/close", methods=["POST"])
+def close_chat_channel(channel_id):
+    with chat_channels_lock:
+        channel = chat_channels.pop(channel_id, None)
+    if channel:
+        end_chat_channel(channel)
+    return "", 204
+
+
 @app.route("/set-language", methods=["POST"])
 def set_language():
     try:
@@ -901,6 +3283,7 @@ def feedback():
     with open(feedback_file, "w") as f:
         json.dump(feedback_list, f, indent=2)
 
+    publish_admin_event("feedback", id=feedback_entry["id"], rating=rating)
     return jsonify({"success": True}), 200
 
 
@@ -1067,15 +3450,786 @@ def admin_queries():
         return jsonify({"error": "Unauthorized"}), 401
 
     try:
-        path = os.path.join("data", "unknown_queries.csv")
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return jsonify({"queries": list(csv.DictReader(f))[::-1]})
-        return jsonify({"queries": []})
+        limit = request.args.get("limit", type=int)
+        if limit:
+            return jsonify({"queries": tail_log_rows(UNKNOWN_QUERIES_LOG, limit)})
+
+        rows = list(
+            read_log_rows(
+                UNKNOWN_QUERIES_LOG,
+                since=request.args.get("since"),
+                until=request.args.get("until"),
+            )
+        )
+        return jsonify({"queries": rows[::-1]})
     except Exception as e:
         return jsonify({"error": "Error loading queries"}), 500
 
 
+# ---------- STREAMING EXPORTS ----------
+# /admin/export/<naam>.<csv|jsonl>: rows generator se ek-ek padhe jaate hain
+# aur ~64KB chunks me bheje jaate hain, to memory export ke size par nirbhar
+# nahi karti. feedback.json bhi poora load nahi hota - array items ek-ek
+# karke decode hote hain. ?gzip=1 par compressobj se chunk-by-chunk .gz.
+EXPORT_CHUNK_SIZE = 64 * 1024
+FEEDBACK_FILE = os.path.join("data", "feedback.json")
+FEEDBACK_TIME_FORMAT = "%d %b %Y %I:%M %p"
+FEEDBACK_HEADERS = ["id", "date", "type", "message", "rating", "status"]
+UNKNOWN_QUERIES_HEADERS = ["timestamp", "query", "status"]
+EXPORT_FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+def iter_json_array(path, chunk_size=EXPORT_CHUNK_SIZE):
+    """JSON array ke items ek-ek karke (poori file memory me nahi aati)"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        while not buffer.strip():
+            more = f.read(chunk_size)
+            if not more:
+                break
+            buffer += more
+        buffer = buffer.lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path}: JSON array nahi hai")
+        pos = 1
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if buffer.startswith("]", pos):
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                # item chunk ki seema par kata hai - aage ka text jodo
+                if eof:
+                    raise
+                more = f.read(chunk_size)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            yield item
+
+
+def feedback_timestamp(item):
+    try:
+        return datetime.strptime(item.get("date", ""), FEEDBACK_TIME_FORMAT).strftime(
+            LOG_TIME_FORMAT
+        )
+    except (TypeError, ValueError):
+        return ""
+
+
+def export_feedback_rows(since, until, status, kind):
+    if not os.path.exists(FEEDBACK_FILE):
+        return
+    for item in iter_json_array(FEEDBACK_FILE):
+        if status and item.get("status", "new") != status:
+            continue
+        if kind and item.get("type") != kind:
+            continue
+        if since or until:
+            ts = feedback_timestamp(item)
+            if (since and ts < since) or (until and ts > until):
+                continue
+        yield item
+
+
+def export_log_rows(path, since, until, status):
+    for row in read_log_rows(path, since=since, until=until):
+        if not status or row.get("status") == status:
+            yield row
+
+
+EXPORTS = {
+    "chat-logs": (
+        CHAT_LOG_HEADERS,
+        lambda since, until, status, kind: read_log_rows(CHAT_LOG, since, until),
+    ),
+    "unknown-queries": (
+        UNKNOWN_QUERIES_HEADERS,
+        lambda since, until, status, kind: export_log_rows(
+            UNKNOWN_QUERIES_LOG, since, until, status
+        ),
+    ),
+    "feedback": (FEEDBACK_HEADERS, export_feedback_rows),
+}
+
+
+def export_time_bound(value, end=False):
+    """"2026-01-31" ya "2026-01-31 10:00:00" -> LOG_TIME_FORMAT string"""
+    if not value:
+        return None
+    value = value.strip()
+    if len(value) == 10:
+        value += " 23:59:59" if end else " 00:00:00"
+    datetime.strptime(value, LOG_TIME_FORMAT)  # galat format par ValueError
+    return value
+
+
+def csv_cell(value):
+    # Excel me "=..." formula ban kar na chale (chat messages public hain)
+    text = "" if value is None else str(value)
+    return "'" + text if text[:1] in ("=", "+", "-", "@") else text
+
+
+def export_lines(rows, headers, fmt):
+    """Rows -> ~EXPORT_CHUNK_SIZE ke text chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(headers)
+    for row in rows:
+        if fmt == "csv":
+            writer.writerow([csv_cell(row.get(h)) for h in headers])
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False) + "\n")
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_stream(chunks, compress):
+    try:
+        if not compress:
+            for chunk in chunks:
+                yield chunk.encode("utf-8")
+            return
+        gz = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = gz.compress(chunk.encode("utf-8"))
+            if data:
+                yield data
+        yield gz.flush()
+    except Exception as e:
+        # headers ja chuke hain; bas log karo, client ko adhuri file milegi
+        print(f"Export error: {e}")
+
+
+@app.route("/admin/export/<name>.<fmt>")
+def admin_export(name, fmt):
+    """?since, ?until (YYYY-MM-DD[ HH:MM:SS]), ?status, ?type, ?gzip=1"""
+    if not session.get("admin"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    if name not in EXPORTS or fmt not in EXPORT_FORMATS:
+        return jsonify({"success": False, "message": "Unknown export"}), 404
+
+    try:
+        since = export_time_bound(request.args.get("since"))
+        until = export_time_bound(request.args.get("until"), end=True)
+    except ValueError:
+        message = "since/until format: YYYY-MM-DD ya YYYY-MM-DD HH:MM:SS"
+        return jsonify({"success": False, "message": message}), 400
+
+    status = request.args.get("status") or None
+    kind = request.args.get("type") or None
+    if status == "all":
+        status = None
+    if kind == "all":
+        kind = None
+    compress = request.args.get("gzip") in ("1", "true")
+
+    headers, source = EXPORTS[name]
+    rows = source(since, until, status, kind)
+    filename = f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+    mimetype = EXPORT_FORMATS[fmt]
+    if compress:
+        filename += ".gz"
+        mimetype = "application/gzip"
+
+    log_admin_activity("EXPORT", name)
+    response = Response(
+        export_stream(export_lines(rows, headers, fmt), compress), mimetype=mimetype
+    )
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+# ---------- ADMIN SEARCH (inverted index) ----------
+# Feedback messages aur unknown queries par word -> {doc: positions} index,
+# saath me type/rating/status ke field sets. Har worker apna index rakhta hai
+# aur search se pehle file version dekh kar sirf naya hissa jodta hai:
+# unknown queries me naye rows (read_log_rows start se), feedback me id ka
+# diff. Query: wifi "hostel mess" type:complaint rating:1 status:new
+SEARCH_FIELDS = ("kind", "type", "rating", "status")
+SEARCH_TOKEN_RE = re.compile(r"\w+")
+SEARCH_QUERY_RE = re.compile(r'(\w+):("[^"]*"|\S+)|"([^"]+)"|(\S+)')
+SEARCH_LIMIT = 50
+
+search_lock = threading.RLock()
+search_index = {
+    "feedback_version": None,
+    "queries_version": None,
+    "queries_stamp": None,
+    "total_length": 0,  # BM25 average ke liye, har search par sum na karna pade
+    "docs": {},  # key -> {"kind", "text", "fields", "length", "row", "position"}
+    "postings": {},  # token -> {key: [positions]}
+    "fields": {},  # (field, value) -> set(keys)
+}
+
+
+def search_tokens(text):
+    return SEARCH_TOKEN_RE.findall((text or "").lower())
+
+
+def add_search_doc(key, kind, text, fields, row, position):
+    tokens = search_tokens(text)
+    fields = {name: str(value).lower() for name, value in fields.items() if value}
+    fields["kind"] = kind
+    search_index["docs"][key] = {
+        "kind": kind,
+        "text": text,
+        "fields": fields,
+        "length": len(tokens),
+        "row": row,
+        "position": position,
+    }
+    search_index["total_length"] += len(tokens)
+    for i, token in enumerate(tokens):
+        search_index["postings"].setdefault(token, {}).setdefault(key, []).append(i)
+    for item in fields.items():
+        search_index["fields"].setdefault(item, set()).add(key)
+
+
+def remove_search_doc(key):
+    doc = search_index["docs"].pop(key, None)
+    if doc is None:
+        return
+    search_index["total_length"] -= doc["length"]
+    for token in set(search_tokens(doc["text"])):
+        postings = search_index["postings"].get(token, {})
+        postings.pop(key, None)
+        if not postings:
+            search_index["postings"].pop(token, None)
+    for item in doc["fields"].items():
+        keys = search_index["fields"].get(item, set())
+        keys.discard(key)
+        if not keys:
+            search_index["fields"].pop(item, None)
+
+
+def refresh_feedback_search():
+    version = data_version(FEEDBACK_FILE)
+    if search_index["feedback_version"] == version:
+        return
+    seen = set()
+    if os.path.exists(FEEDBACK_FILE):
+        for position, item in enumerate(iter_json_array(FEEDBACK_FILE)):
+            key = f"feedback:{item.get('id', position)}"
+            seen.add(key)
+            doc = search_index["docs"].get(key)
+            fields = {
+                "type": item.get("type"),
+                "rating": item.get("rating"),
+                "status": item.get("status", "new"),
+            }
+            if doc is not None and doc["row"] == item:
+                doc["position"] = position  # naya feedback upar judta hai
+                continue
+            remove_search_doc(key)
+            add_search_doc(
+                key, "feedback", item.get("message", ""), fields, item, position
+            )
+    for key in [k for k in search_index["docs"] if k.startswith("feedback:")]:
+        if key not in seen:
+            remove_search_doc(key)
+    search_index["feedback_version"] = version
+
+
+def refresh_queries_search():
+    # pehle sasta stat check; row count tabhi gino jab file/manifest badle
+    stamp = (
+        data_version(UNKNOWN_QUERIES_LOG),
+        data_version(log_manifest_path(UNKNOWN_QUERIES_LOG)),
+    )
+    if search_index["queries_stamp"] == stamp:
+        return
+    version = log_rows_version(UNKNOWN_QUERIES_LOG)
+    previous = search_index["queries_version"]
+    search_index["queries_stamp"] = stamp
+    if previous == version:
+        return
+    if previous and previous[0] == version[0] and previous[2] == version[2]:
+        start = previous[1] - version[0]  # sirf naye rows
+    else:
+        start = 0
+        for key in [k for k in search_index["docs"] if k.startswith("query:")]:
+            remove_search_doc(key)
+    dropped = version[0]
+    for offset, row in enumerate(read_log_rows(UNKNOWN_QUERIES_LOG, start=start)):
+        number = dropped + start + offset  # absolute row number
+        add_search_doc(
+            f"query:{number}",
+            "query",
+            row.get("query", ""),
+            {"status": row.get("status")},
+            row,
+            number - dropped,
+        )
+    search_index["queries_version"] = version
+
+
+def parse_search_query(text):
+    """(terms, phrases, field filters)"""
+    terms, phrases, filters = [], [], {}
+    for field, value, phrase, word in SEARCH_QUERY_RE.findall(text or ""):
+        if field and field.lower() in SEARCH_FIELDS:
+            filters[field.lower()] = value.strip('"').lower()
+        elif phrase:
+            tokens = search_tokens(phrase)
+            if len(tokens) > 1:
+                phrases.append(tokens)
+            terms.extend(tokens)
+        else:
+            terms.extend(search_tokens(f"{field}:{value}" if field else word))
+    return terms, phrases, filters
+
+
+def phrase_matches(key, tokens):
+    postings = search_index["postings"]
+    starts = set(postings[tokens[0]][key])
+    for i, token in enumerate(tokens[1:], 1):
+        starts &= {p - i for p in postings[token][key]}
+        if not starts:
+            return False
+    return True
+
+
+def search_admin_items(text, filters=None, limit=SEARCH_LIMIT):
+    """Ranked results (BM25 jaisa score); sab terms zaroori (AND)"""
+    terms, phrases, parsed_filters = parse_search_query(text)
+    parsed_filters.update({k: str(v).lower() for k, v in (filters or {}).items() if v})
+
+    with search_lock:
+        refresh_feedback_search()
+        refresh_queries_search()
+
+        docs = search_index["docs"]
+        postings = search_index["postings"]
+        candidates = None
+        # sabse chhoti list se shuru karo, baaki se intersect
+        sets = [
+            search_index["fields"].get(item, set()) for item in parsed_filters.items()
+        ]
+        sets += [postings.get(term, {}).keys() for term in set(terms)]
+        for keys in sorted(sets, key=len):
+            candidates = set(keys) if candidates is None else candidates & set(keys)
+            if not candidates:
+                return []
+        if candidates is None:
+            return []
+        candidates = [
+            key for key in candidates if all(phrase_matches(key, p) for p in phrases)
+        ]
+
+        total = len(docs)
+        average = search_index["total_length"] / total if total else 1
+        scored = []
+        for key in candidates:
+            doc = docs[key]
+            score = 0.0
+            for term in set(terms):
+                matches = postings[term]
+                tf = len(matches[key])
+                idf = math.log(1 + (total - len(matches) + 0.5) / (len(matches) + 0.5))
+                norm = tf + 1.2 * (0.25 + 0.75 * doc["length"] / (average or 1))
+                score += idf * tf * 2.2 / norm
+            score += len(phrases)
+            # barabar score par naya pehle (feedback me 0 = sabse naya)
+            newest = -doc["position"] if doc["kind"] == "feedback" else doc["position"]
+            scored.append((-score, doc["kind"], -newest, key))
+
+        results = []
+        for score, _, _, key in heapq.nsmallest(limit, scored):
+            score = -score
+            doc = docs[key]
+            results.append(
+                {
+                    "kind": doc["kind"],
+                    "score": round(score, 3),
+                    "index": doc["position"],
+                    "text": doc["text"],
+                    **{f: doc["fields"].get(f) for f in SEARCH_FIELDS if f != "kind"},
+                    "row": doc["row"],
+                }
+            )
+        return results
+
+
+@app.route("/admin/search")
+def admin_search():
+    """?q=wifi "hostel mess" type:complaint + ?kind/type/rating/status/limit"""
+    if not session.get("admin"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    started = time.perf_counter()
+    filters = {field: request.args.get(field) for field in SEARCH_FIELDS}
+    limit = min(request.args.get("limit", SEARCH_LIMIT, type=int), 500)
+    try:
+        results = search_admin_items(request.args.get("q", ""), filters, limit)
+    except Exception as e:
+        print(f"Search error: {e}")
+        return jsonify({"success": False, "message": "Search failed"}), 500
+    return jsonify(
+        {
+            "success": True,
+            "count": len(results),
+            "took_ms": round((time.perf_counter() - started) * 1000, 2),
+            "results": results,
+        }
+    )
+
+
+# ---------- ADMIN CHANGE FEED ----------
+# Naya feedback, unknown query, status change, upload/delete - sab ek chhoti
+# data/admin_events.jsonl file me increasing id ke saath append hote hain
+# (har worker likh sakta hai, flock ke saath). Admin tab SSE se tail karta hai
+# aur Last-Event-ID se resume karta hai; sync worker par long polling.
+# Event aane par dashboard /admin/bootstrap se sirf delta mangwata hai.
+# Worker budget: SSE / long poll ek thread pakadte hain, isliye har worker
+# me ADMIN_MAX_WAITERS (threads ka chhota hissa) se zyada nahi; baaki ko
+# turant jawab + retry_ms milta hai. Sync worker (ek request = poora worker)
+# par kabhi wait nahi hota, sirf short poll.
+ADMIN_EVENTS_LOG = os.path.join("data", "admin_events.jsonl")
+ADMIN_EVENTS_KEEP = 500
+ADMIN_EVENTS_MAX_BYTES = 256 * 1024
+ADMIN_EVENTS_BATCH = 50
+ADMIN_EVENTS_POLL = 1.0
+ADMIN_STREAM_HEARTBEAT = 15
+ADMIN_STREAM_MAX_SECONDS = 120
+ADMIN_LONG_POLL_SECONDS = 20
+ADMIN_SHORT_POLL_MS = 10000
+ADMIN_MAX_WAITERS = max(int(os.getenv("GUNICORN_THREADS", "16")) // 8, 1)
+
+admin_waiters = {"active": 0}
+admin_waiters_lock = threading.Lock()
+
+
+def claim_admin_waiter():
+    """Wait karne wala slot lo; cap full ho to False"""
+    with admin_waiters_lock:
+        if admin_waiters["active"] >= ADMIN_MAX_WAITERS:
+            return False
+        admin_waiters["active"] += 1
+        return True
+
+
+def release_admin_waiter():
+    with admin_waiters_lock:
+        admin_waiters["active"] -= 1
+
+
+def last_admin_event_id():
+    """Aakhri event id - sirf file ka tail padhte hain"""
+    try:
+        with open(ADMIN_EVENTS_LOG, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 4096, 0))
+            lines = f.read().splitlines()
+    except OSError:
+        return 0
+    for line in reversed(lines):
+        try:
+            return int(json.loads(line)["id"])
+        except (ValueError, KeyError, TypeError):
+            continue
+    return 0
+
+
+def publish_admin_event(event_type, **data):
+    """Change event likho; fail ho to bhi asli action nahi rukna chahiye"""
+    try:
+        with log_lock(ADMIN_EVENTS_LOG):
+            event = {
+                "id": last_admin_event_id() + 1,
+                "type": event_type,
+                "ts": datetime.now().strftime(LOG_TIME_FORMAT),
+                "data": data,
+            }
+            with open(ADMIN_EVENTS_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+            if os.path.getsize(ADMIN_EVENTS_LOG) > ADMIN_EVENTS_MAX_BYTES:
+                with open(ADMIN_EVENTS_LOG, "r", encoding="utf-8") as f:
+                    keep = f.readlines()[-ADMIN_EVENTS_KEEP:]
+                tmp_path = ADMIN_EVENTS_LOG + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.writelines(keep)
+                os.replace(tmp_path, ADMIN_EVENTS_LOG)
+    except Exception as e:
+        print(f"Admin event error: {e}")
+
+
+def read_admin_events(cursor, limit=ADMIN_EVENTS_BATCH):
+    """cursor (inode, offset, last_id) ke baad ke max `limit` events"""
+    try:
+        st = os.stat(ADMIN_EVENTS_LOG)
+    except OSError:
+        return []
+    if cursor["inode"] != st.st_ino or st.st_size < cursor["offset"]:
+        # file trim/replace hui: shuru se padho, id se filter ho jaayega
+        cursor.update(inode=st.st_ino, offset=0)
+    if st.st_size == cursor["offset"]:
+        return []
+
+    events = []
+    with open(ADMIN_EVENTS_LOG, "rb") as f:
+        f.seek(cursor["offset"])
+        while len(events) < limit:
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                break  # adhuri line - agli baar
+            cursor["offset"] = f.tell()
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get("id", 0) > cursor["last_id"]:
+                events.append(event)
+                cursor["last_id"] = event["id"]
+    return events
+
+
+def admin_events_mode(environ):
+    """Threaded worker par SSE, sync worker par long polling"""
+    return "sse" if environ.get("wsgi.multithread") else "poll"
+
+
+@app.route("/admin/events")
+def admin_events():
+    if not session.get("admin"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    after = request.headers.get("Last-Event-ID") or request.args.get("after", "")
+    cursor = {"inode": None, "offset": 0, "last_id": 0}
+    if after.isdigit():
+        cursor["last_id"] = int(after)
+    else:
+        # koi id nahi: abhi se aage ke events
+        cursor["last_id"] = last_admin_event_id()
+        try:
+            st = os.stat(ADMIN_EVENTS_LOG)
+            cursor.update(inode=st.st_ino, offset=st.st_size)
+        except OSError:
+            pass
+
+    threaded = admin_events_mode(request.environ) == "sse"
+    if request.args.get("mode") == "poll" or not threaded:
+        events = read_admin_events(cursor)
+        if not events and threaded and claim_admin_waiter():
+            try:
+                deadline = time.time() + ADMIN_LONG_POLL_SECONDS
+                while not events and time.time() < deadline:
+                    time.sleep(ADMIN_EVENTS_POLL)
+                    events = read_admin_events(cursor)
+            finally:
+                release_admin_waiter()
+            retry_ms = 0
+        else:
+            retry_ms = 0 if events else ADMIN_SHORT_POLL_MS
+        return jsonify(
+            {
+                "success": True,
+                "events": events,
+                "last_id": cursor["last_id"],
+                "retry_ms": retry_ms,
+            }
+        )
+
+    if not claim_admin_waiter():
+        # stream slots full - client polling par chala jaata hai
+        return jsonify({"success": False, "message": "Use polling"}), 503
+
+    def stream():
+        yield "retry: 3000\n\n"
+        started = last_beat = time.time()
+        # connection ki umar limited; browser Last-Event-ID ke saath wapas aata hai
+        while time.time() - started < ADMIN_STREAM_MAX_SECONDS:
+            events = read_admin_events(cursor)
+            for event in events:
+                yield (
+                    f"id: {event['id']}\nevent: change\n"
+                    f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                )
+            if events:
+                last_beat = time.time()
+                continue
+            if time.time() - last_beat >= ADMIN_STREAM_HEARTBEAT:
+                last_beat = time.time()
+                yield ": ping\n\n"
+            time.sleep(ADMIN_EVENTS_POLL)
+
+    response = Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # slot tab chhutta hai jab server response band kare (disconnect par bhi)
+    response.call_on_close(release_admin_waiter)
+    return response
+
+
+# Dashboard ke saare datasets ek request me. Har section ka version hota hai;
+# client `since` me purane versions bheje to sirf badle sections aate hain,
+# aur unknown queries me sirf naye rows (mode "append").
+def parse_rows_version(value):
+    try:
+        dropped, total, edits = (int(x) for x in str(value).split("."))
+        return dropped, total, edits
+    except ValueError:
+        return None
+
+
+@app.route("/admin/bootstrap")
+def admin_bootstrap():
+    if not session.get("admin"):
+        return jsonify({"success": True, "loggedin": False})
+
+    try:
+        since = json.loads(request.args.get("since") or "{}")
+        if not isinstance(since, dict):
+            since = {}
+    except ValueError:
+        since = {}
+
+    events = {
+        "mode": admin_events_mode(request.environ),
+        "last_id": last_admin_event_id(),
+    }
+    versions = {
+        "feedback": data_version(os.path.join("data", "feedback.json")),
+        "files": f"{data_version(SYLLABUS_DB)}.{media_version('pdfs')}",
+        "college_data": data_version(DATA_FILE),
+    }
+    loaders = {
+        "feedback": load_feedback_data,
+        "files": list_valid_pdfs,
+        "college_data": load_college_data,
+    }
+
+    sections = {}
+    try:
+        for name, loader in loaders.items():
+            if since.get(name) != versions[name]:
+                sections[name] = {"version": versions[name], "rows": loader()}
+
+        current = log_rows_version(UNKNOWN_QUERIES_LOG)
+        versions["queries"] = ".".join(str(x) for x in current)
+        previous = parse_rows_version(since.get("queries"))
+        if previous != current:
+            # version ke baad append hue rows mat lo (agli baar append me aayenge),
+            # warna client unhe do baar dikhata
+            end = current[1] - current[0]
+            if (
+                previous
+                and previous[0] == current[0]
+                and previous[2] == current[2]
+                and previous[1] < current[1]
+            ):
+                start = previous[1] - current[0]
+                rows = list(
+                    islice(read_log_rows(UNKNOWN_QUERIES_LOG, start=start), end - start)
+                )
+                mode = "append"
+            else:
+                rows = list(islice(read_log_rows(UNKNOWN_QUERIES_LOG), end))
+                mode = "full"
+            sections["queries"] = {
+                "version": versions["queries"],
+                "mode": mode,
+                "rows": rows[::-1],  # naye pehle, /adminunknown-queries jaisa
+            }
+    except Exception as e:
+        print(f"Bootstrap error: {e}")
+        return jsonify({"success": False, "message": "Error loading dashboard"}), 500
+
+    return jsonify(
+        {
+            "success": True,
+            "loggedin": True,
+            "versions": versions,
+            "sections": sections,
+            "events": events,
+        }
+    )
+
+
+@app.route("/admin/analytics")
+def admin_analytics():
+    """Chat usage: hourly (48h) ya daily (90 din) buckets + top intents/queries"""
+    if not session.get("admin"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    period = request.args.get("period", "daily")
+    if period not in ("hourly", "daily"):
+        return jsonify({"success": False, "message": "Invalid period"}), 400
+
+    flush_rollups()
+    data = load_rollups()
+
+    totals = [0] * len(ROLLUP_FIELDS)
+    buckets = []
+    for key in sorted(data[period]):
+        values = data[period][key]
+        totals = [a + b for a, b in zip(totals, values)]
+        buckets.append(describe_rollup_bucket(key, values))
+
+    summary = describe_rollup_bucket(period, totals)
+    top_queries = {}
+    for table in data["queries"].values():
+        for query, count in table.items():
+            top_queries[query] = top_queries.get(query, 0) + count
+
+    return jsonify(
+        {
+            "success": True,
+            "period": period,
+            "summary": summary,
+            "top_intents": sorted(
+                summary["intents"].items(), key=lambda x: x[1], reverse=True
+            )[:10],
+            "top_queries": sorted(
+                top_queries.items(), key=lambda x: x[1], reverse=True
+            )[:20],
+            "buckets": buckets,
+        }
+    )
+
+
+@app.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """chat_logs (segments samet) se analytics rollups dobara banao"""
+    total = rebuild_rollups()
+    click.echo(f"{total} chat rows replayed into {ROLLUP_DB}")
+
+
+@app.route("/admin/rate-limit-stats")
+def rate_limit_stats():
+    if not session.get("admin"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    with rate_limit_locked() as mm:
+        _, allowed, throttled_ip, throttled_global = RATE_LIMIT_HEADER.unpack_from(
+            mm, 0
+        )
+    return jsonify(
+        {
+            "success": True,
+            "allowed": allowed,
+            "throttled_per_ip": throttled_ip,
+            "throttled_global": throttled_global,
+            "limits": RATE_LIMITS,
+        }
+    )
+
+
 @app.route("/adminlogout")
 def admin_logout():
     session.clear()
@@ -1083,47 +4237,129 @@ def admin_logout():
 
 
 # Public APIs
+# Body ek baar per data version serialize hota hai (warm-up me bhi), ETag ke saath
+api_body_cache = {}
+
+
+def api_body_entry(name):
+    """Is worker ka serialized body + etag; request ki zaroorat nahi"""
+    payload, sections = API_PAYLOADS[name]
+    version = college_section_version(*sections)
+    entry = api_body_cache.get(name)
+    if entry is None or entry["version"] != version:
+        body = (app.json.dumps(payload(college_info)) + "\n").encode("utf-8")
+        entry = {
+            "version": version,
+            "body": body,
+            "etag": hashlib.sha1(body).hexdigest(),
+        }
+        api_body_cache[name] = entry
+    return entry
+
+
+def cached_json_response(name):
+    snapshot = get_knowledge_snapshot()
+    if snapshot is not None:
+        body = snapshot_lookup(f"api:{name}", snapshot)
+        etag = snapshot_lookup(f"etag:api:{name}", snapshot)
+        if body is not None and etag is not None:
+            response = Response(body.tobytes(), mimetype="application/json")
+            response.set_etag(str(etag, "ascii"))
+            return response.make_conditional(request)
+
+    entry = api_body_entry(name)
+    response = Response(entry["body"], mimetype="application/json")
+    response.set_etag(entry["etag"])
+    return response.make_conditional(request)
+
+
+def college_info_payload(data):
+    return {
+        "name": data["name"],
+        "address": data["address"],
+        "phone": data["phone"],
+        "email": data["email"],
+        "website": data["website"],
+        "map_link": data["map_link"],
+    }
+
+
+def courses_payload(data):
+    return {
+        "undergraduate": data["ug_courses"],
+        "postgraduate": data["pg_courses"],
+        "diploma": data["diploma_courses"],
+    }
+
+
+# API naam -> (college data se payload, kin sections par depend karta hai)
+API_PAYLOADS = {
+    "college-info": (college_info_payload, CONTACT_SECTIONS),
+    "courses": (courses_payload, COURSE_SECTIONS),
+    "facilities": (lambda data: data["facilities"], ("facilities",)),
+}
+
+
 @app.route("/api/college-info")
 def api_college_info():
-    return jsonify(
-        {
-            "name": college_info["name"],
-            "address": college_info["address"],
-            "phone": college_info["phone"],
-            "email": college_info["email"],
-            "website": college_info["website"],
-            "map_link": college_info["map_link"],
-        }
-    )
+    return cached_json_response("college-info")
 
 
 @app.route("/api/courses")
 def api_courses():
-    return jsonify(
-        {
-            "undergraduate": college_info["ug_courses"],
-            "postgraduate": college_info["pg_courses"],
-            "diploma": college_info["diploma_courses"],
-        }
-    )
+    """?max_fee / ?min_fee / ?category / ?limit ho to fee index se filtered list"""
+    if not {"max_fee", "min_fee", "category", "limit"} & set(request.args):
+        return cached_json_response("courses")
+
+    category = request.args.get("category") or None
+    if category is not None and category not in FEE_CATEGORIES:
+        message = "category: ug, pg ya diploma"
+        return jsonify({"success": False, "message": message}), 400
+    try:
+        min_fee, max_fee, limit = (
+            None if request.args.get(key) in (None, "") else int(request.args[key])
+            for key in ("min_fee", "max_fee", "limit")
+        )
+    except ValueError:
+        message = "min_fee, max_fee aur limit number hone chahiye"
+        return jsonify({"success": False, "message": message}), 400
+
+    rows = courses_by_fee(category, min_fee, max_fee)
+    if limit is not None:
+        rows = rows[: max(limit, 0)]
+    courses = []
+    for fee, name, short, months in rows:
+        info = college_info[FEE_CATEGORIES[short]][name]
+        courses.append(
+            {
+                "name": name,
+                "category": short,
+                "fee": info["fee"],
+                "fee_per_year": fee,
+                "duration": info["duration"],
+                "duration_months": months,
+            }
+        )
+    return jsonify({"success": True, "count": len(courses), "courses": courses})
 
 
 @app.route("/api/facilities")
 def api_facilities():
-    return jsonify(college_info["facilities"])
+    return cached_json_response("facilities")
 
 
 # Error Handlers
 @app.errorhandler(404)
 def not_found_error(error):
-    return (
-        render_template(
-            "error.html",
-            error_code=404,
-            error_message="Page not found",
-            college_info=college_info,
-        ),
-        404,
+    return cached_page(
+        ("error404", college_data_version()),
+        "error.html",
+        lambda: {
+            "error_code": 404,
+            "error_message": "Page not found",
+            "college_info": college_info,
+        },
+        status=404,
     )
 
 
@@ -1177,8 +4413,9 @@ def upload_pdf():
             if category == "notes" and "note" not in clean_name.lower():
                 clean_name = f"Note_{clean_name}"
 
-            save_path = os.path.join(PDF_FOLDER, clean_name)
+            save_path = media_target_path("pdfs", clean_name)
             file.save(save_path)
+            register_media("pdfs", [clean_name])
 
             # Database Update
             current_db = load_syllabus_db()
@@ -1186,49 +4423,271 @@ def upload_pdf():
             # Duplicate hatao
             current_db = [item for item in current_db if item["filename"] != clean_name]
 
-            new_entry = {
-                "filename": clean_name,
-                "course": course,
+            new_entry = {
+                "filename": clean_name,
+                "course": course,
+                "semester": semester,
+                "category": category,  # ✅ Category save kar rahe hain
+                "uploaded_at": datetime.now().strftime("%Y-%m-%d"),
+            }
+            current_db.append(new_entry)
+            save_syllabus_db(current_db)
+            publish_admin_event("upload", kind="pdf", filename=clean_name)
+
+            return jsonify(
+                {
+                    "success": True,
+                    "message": f"{category.title()} Uploaded Successfully!",
+                }
+            )
+
+        except Exception as e:
+            return jsonify({"success": False, "message": f"Server Error: {str(e)}"})
+
+    return jsonify({"success": False, "message": "Upload failed"})
+
+
+# ---------- BULK NOTES / SYLLABUS INGEST ----------
+# Filename convention: Note_BCA_Y3_Java_Programming_Unit_4_EN.pdf (notes)
+# aur BCA_3rd_Year.pdf (syllabus). ZIP ya folder se ek saath ingest.
+NOTE_FILENAME_RE = re.compile(
+    r"^(?:note_)?(?P<course>[a-z.]+)_y(?P<year>\d)_(?P<subject>.+?)"
+    r"_unit_(?P<unit>\d+)_(?P<language>en|hi|bi)(?:\.pdf)+$",
+    re.IGNORECASE,
+)
+SYLLABUS_FILENAME_RE = re.compile(
+    r"^(?:syllabus_)?(?P<course>[a-z.]+)_(?P<year>\d)(?:st|nd|rd|th)_year(?:\.pdf)+$",
+    re.IGNORECASE,
+)
+PDF_LANGUAGES = {"EN": "English", "HI": "Hindi", "BI": "Bilingual"}
+INGEST_WORKERS = 4
+MAX_INGEST_FILES = 1000
+MAX_INGEST_BYTES = 1024 * 1024 * 1024
+# HTTP upload ek thread aur temp disk pakadta hai, isliye /admin/bulk-ingest
+# par ZIP 256MB tak; isse bade archive `flask ingest-notes` se (1GB tak)
+MAX_INGEST_UPLOAD_BYTES = 256 * 1024 * 1024
+ROUTE_CONTENT_LENGTHS["bulk_ingest"] = MAX_INGEST_UPLOAD_BYTES
+
+
+def parse_pdf_filename(filename):
+    """Filename se course/year/subject/unit/language nikaalo; match na ho to None"""
+    match = NOTE_FILENAME_RE.match(filename)
+    if match:
+        return {
+            "category": "notes",
+            "course": match["course"].upper(),
+            "year": int(match["year"]),
+            "subject": match["subject"].replace("_", " "),
+            "unit": int(match["unit"]),
+            "language": PDF_LANGUAGES[match["language"].upper()],
+        }
+
+    match = SYLLABUS_FILENAME_RE.match(filename)
+    if match:
+        return {
+            "category": "syllabus",
+            "course": match["course"].upper(),
+            "year": int(match["year"]),
+        }
+    return None
+
+
+def zip_ingest_sources(archive):
+    """ZIP ke PDF entries: (naam, size, opener)"""
+    sources = []
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        name = os.path.basename(info.filename)
+        sources.append((name, info.file_size, lambda i=info: archive.open(i)))
+    return sources
+
+
+def dir_ingest_sources(folder):
+    sources = []
+    for entry in os.scandir(folder):
+        if entry.is_file():
+            sources.append(
+                (entry.name, entry.stat().st_size, lambda p=entry.path: open(p, "rb"))
+            )
+    return sources
+
+
+def extract_pdf(source):
+    """Ek PDF ko temp file me stream karke final naam par replace karo"""
+    filename, opener = source
+    final_path = media_target_path("pdfs", filename)
+    tmp_path = final_path + f".{secrets.token_hex(4)}.part"
+    try:
+        with opener() as src, open(tmp_path, "wb") as dst:
+            if src.read(5) != b"%PDF-":
+                raise ValueError("Not a PDF file")
+            dst.write(b"%PDF-")
+            shutil.copyfileobj(src, dst, 256 * 1024)
+        os.replace(tmp_path, final_path)
+        return filename, None
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return filename, str(e)
+
+
+def ingest_pdfs(sources, semester="Yearly", dry_run=False):
+    """Parse + parallel extract + syllabus_metadata.json me ek atomic update"""
+    report = {"dry_run": dry_run, "parsed": [], "skipped": [], "written": 0}
+
+    if len(sources) > MAX_INGEST_FILES:
+        raise ValueError(f"Max {MAX_INGEST_FILES} files per ingest")
+    if sum(size for _, size, _ in sources) > MAX_INGEST_BYTES:
+        raise ValueError("Archive too large")
+
+    planned = {}
+    for name, _, opener in sources:
+        if not name.lower().endswith(".pdf"):
+            report["skipped"].append({"entry": name, "reason": "Not a PDF"})
+            continue
+
+        meta = parse_pdf_filename(name)
+        if meta is None:
+            report["skipped"].append(
+                {"entry": name, "reason": "Filename convention not recognised"}
+            )
+            continue
+
+        clean_name = secure_filename(name)
+        if meta["category"] == "notes" and "note" not in clean_name.lower():
+            clean_name = f"Note_{clean_name}"
+        if clean_name in planned:
+            # alag folders ki same naam wali files ek doosre ko overwrite karti
+            report["skipped"].append(
+                {"entry": name, "reason": f"Duplicate of {clean_name}"}
+            )
+            continue
+        planned[clean_name] = (meta, opener)
+        report["parsed"].append({"filename": clean_name, **meta})
+
+    if dry_run or not planned:
+        return report
+
+    os.makedirs(PDF_FOLDER, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as pool:
+        results = list(
+            pool.map(
+                extract_pdf,
+                [(name, opener) for name, (_, opener) in planned.items()],
+            )
+        )
+
+    register_media("pdfs", [filename for filename, error in results if not error])
+
+    uploaded_at = datetime.now().strftime("%Y-%m-%d")
+    entries = []
+    for filename, error in results:
+        if error:
+            report["skipped"].append({"entry": filename, "reason": error})
+            continue
+        meta = planned[filename][0]
+        entries.append(
+            {
+                "filename": filename,
+                "course": meta["course"],
                 "semester": semester,
-                "category": category,  # ✅ Category save kar rahe hain
-                "uploaded_at": datetime.now().strftime("%Y-%m-%d"),
+                "uploaded_at": uploaded_at,
+                **meta,
             }
-            current_db.append(new_entry)
-            save_syllabus_db(current_db)
+        )
 
-            return jsonify(
-                {
-                    "success": True,
-                    "message": f"{category.title()} Uploaded Successfully!",
-                }
-            )
+    if entries:
+        names = {e["filename"] for e in entries}
+        with log_lock(SYLLABUS_DB):
+            current_db = [
+                item for item in load_syllabus_db() if item["filename"] not in names
+            ]
+            if not save_syllabus_db(current_db + entries):
+                raise IOError("Syllabus metadata save failed")
+    report["written"] = len(entries)
+    if entries:
+        publish_admin_event("upload", kind="pdf", count=len(entries))
+    return report
 
-        except Exception as e:
-            return jsonify({"success": False, "message": f"Server Error: {str(e)}"})
 
-    return jsonify({"success": False, "message": "Upload failed"})
+@csrf.exempt
+@app.route("/admin/bulk-ingest", methods=["POST"])
+def bulk_ingest():
+    """ZIP upload se poore semester ke notes/syllabus ek operation me"""
+    if not session.get("admin"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
 
+    archive_file = request.files.get("archive")
+    if not archive_file or not archive_file.filename:
+        return jsonify({"success": False, "message": "No archive selected"}), 400
 
-@app.route("/admin/list-pdfs")
-def list_pdfs():
-    """Folder me jitni PDF hain unki list JSON db ke saath bhejega"""
-    if not session.get("admin"):
-        return jsonify({"error": "Unauthorized"}), 401
+    dry_run = request.form.get("dry_run", "").lower() in ("1", "true", "yes")
+    semester = request.form.get("semester", "Yearly")
+
+    try:
+        with zipfile.ZipFile(archive_file.stream) as archive:
+            report = ingest_pdfs(
+                zip_ingest_sources(archive), semester=semester, dry_run=dry_run
+            )
+    except zipfile.BadZipFile:
+        return jsonify({"success": False, "message": "Invalid ZIP file"}), 400
+    except (ValueError, IOError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    return jsonify({"success": True, **report})
+
+
+@app.cli.command("ingest-notes")
+@click.argument("source", type=click.Path(exists=True))
+@click.option("--semester", default="Yearly", help="Metadata me semester")
+@click.option("--dry-run", is_flag=True, help="Sirf report, kuch likho mat")
+def ingest_notes_command(source, semester, dry_run):
+    """ZIP ya folder se notes/syllabus PDFs ingest karo"""
+    if os.path.isdir(source):
+        report = ingest_pdfs(dir_ingest_sources(source), semester, dry_run)
+    else:
+        with zipfile.ZipFile(source) as archive:
+            report = ingest_pdfs(zip_ingest_sources(archive), semester, dry_run)
+
+    for item in report["parsed"]:
+        details = " ".join(
+            f"{k}={item[k]}" for k in ("category", "course", "year", "subject", "unit")
+            if k in item
+        )
+        click.echo(f"  OK    {item['filename']}  {details}")
+    for item in report["skipped"]:
+        click.echo(f"  SKIP  {item['entry']}: {item['reason']}")
+    if dry_run:
+        click.echo(f"Dry run: {len(report['parsed'])} files would be written")
+    else:
+        skipped = len(report["skipped"])
+        click.echo(f"{report['written']} files written, {skipped} skipped")
 
+
+def list_valid_pdfs():
     # 1. DB se data load karo
     db_data = load_syllabus_db()
 
     # 2. Cross check: Sirf wahi dikhao jo folder me actually exist karti hain
     valid_data = []
     if os.path.exists(PDF_FOLDER):
-        actual_files = set(os.listdir(PDF_FOLDER))
+        actual_files = list_media("pdfs")
         for item in db_data:
             # Agar file folder me hai, tabhi list me dikhao
             if item["filename"] in actual_files:
                 valid_data.append(item)
+    return valid_data
+
+
+@app.route("/admin/list-pdfs")
+def list_pdfs():
+    """Folder me jitni PDF hain unki list JSON db ke saath bhejega"""
+    if not session.get("admin"):
+        return jsonify({"error": "Unauthorized"}), 401
 
     # Frontend ko bhej do
-    return jsonify({"files": valid_data})
+    return jsonify({"files": list_valid_pdfs()})
 
 
 @csrf.exempt
@@ -1243,15 +4702,14 @@ def delete_gallery_image():
     if not filename:
         return jsonify({"success": False, "message": "Filename missing"}), 400
 
-    # Delete file from static folder
-    file_path = os.path.join(app.static_folder, "images", "gallery", filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    # Delete file from its shard (ya purane flat folder)
+    delete_media("gallery", filename)
 
     # Delete from gallery DB (JSON)
     db = load_gallery_db()
     db = [img for img in db if img.get("filename") != filename]
     save_gallery_db(db)
+    publish_admin_event("delete", kind="gallery", filename=filename)
 
     return jsonify({"success": True})
 
@@ -1272,17 +4730,14 @@ def delete_pdf():
         return jsonify(success=False, message="Invalid filename"), 400
 
     try:
-        file_path = os.path.join(app.root_path, "static", "pdfs", filename)
-
-        if not os.path.exists(file_path):
+        if not delete_media("pdfs", filename):
             return jsonify(success=False, message="File not found"), 404
 
-        os.remove(file_path)
-
         # remove from DB
         current_db = load_syllabus_db()
         new_db = [item for item in current_db if item.get("filename") != filename]
         save_syllabus_db(new_db)
+        publish_admin_event("delete", kind="pdf", filename=filename)
 
         return jsonify(success=True, message="File deleted successfully")
 
@@ -1293,11 +4748,11 @@ def delete_pdf():
 
 @app.route("/syllabus")
 def syllabus_page():
-    data = load_syllabus_db()
-
-    print(f"DEBUG: Found {len(data)} files in database.")
-
-    return render_template("syllabus.html", files=data)
+    return cached_page(
+        ("syllabus", data_version(SYLLABUS_DB)),
+        "syllabus.html",
+        lambda: {"files": load_syllabus_db()},
+    )
 
 
 @app.route("/admin/get-stats")
@@ -1314,33 +4769,26 @@ def get_stats():
 
     # Feedback queries load karne ka logic
     feedback_file = "data/feedback_queries.csv"
-    if os.path.exists(feedback_file):
-        try:
-            with open(feedback_file, mode="r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                rows = list(reader)
-
-                stats["total_queries"] = len(rows)
-                # Resolved count (Agar status column use kar rahe ho)
-                stats["resolved_queries"] = len(
-                    [r for r in rows if r.get("status") == "Resolved"]
-                )
-                stats["pending_queries"] = (
-                    stats["total_queries"] - stats["resolved_queries"]
-                )
-
-                # Latest 10 feedback table ke liye
-                for row in reversed(rows[-10:]):
-                    stats["recent_feedback"].append(
-                        {
-                            "user": row.get("name", "Anonymous"),
-                            "query": row.get("query", "No Message"),
-                            "time": row.get("timestamp", "N/A"),
-                            "status": row.get("status", "Pending"),
-                        }
-                    )
-        except Exception as e:
-            print(f"Error loading stats: {e}")
+    try:
+        # Resolved count (Agar status column use kar rahe ho)
+        for row in read_log_rows(feedback_file):
+            stats["total_queries"] += 1
+            if row.get("status") == "Resolved":
+                stats["resolved_queries"] += 1
+        stats["pending_queries"] = stats["total_queries"] - stats["resolved_queries"]
+
+        # Latest 10 feedback table ke liye
+        for row in tail_log_rows(feedback_file, 10):
+            stats["recent_feedback"].append(
+                {
+                    "user": row.get("name", "Anonymous"),
+                    "query": row.get("query", "No Message"),
+                    "time": row.get("timestamp", "N/A"),
+                    "status": row.get("status", "Pending"),
+                }
+            )
+    except Exception as e:
+        print(f"Error loading stats: {e}")
 
     return jsonify(stats)
 
@@ -1349,6 +4797,242 @@ GALLERY_FOLDER = os.path.join("static", "images", "gallery")
 os.makedirs(GALLERY_FOLDER, exist_ok=True)
 
 
+# ---------- SHARDED MEDIA STORAGE ----------
+# Gallery images aur PDFs flat folder ki jagah <root>/ab/cd/<naam> me rehte
+# hain (ab/cd = naam ka sha1 prefix), taki ek folder me hazaron files na hon.
+# data/media_manifest.json public naam -> shard path map rakhta hai; listing
+# isi se hoti hai. Public URL wahi rehte hain (/static/pdfs/<naam>), neeche
+# wale routes naam ko shard par resolve karte hain. Purani (flat) files
+# `flask migrate-media` chalne tak wahin se serve hoti hain.
+MEDIA_MANIFEST = os.path.join("data", "media_manifest.json")
+MEDIA_ROOTS = {"gallery": GALLERY_FOLDER, "pdfs": PDF_FOLDER}
+
+media_manifest_cache = {"stamp": None, "data": None}
+
+
+def media_shard(name):
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}"
+
+
+def load_media_manifest():
+    """{kind: {naam: relative path}} - file badle tabhi dobara padhte hain"""
+    stamp = data_version(MEDIA_MANIFEST)
+    if media_manifest_cache["stamp"] != stamp:
+        data = {kind: {} for kind in MEDIA_ROOTS}
+        try:
+            with open(MEDIA_MANIFEST, "r", encoding="utf-8") as f:
+                data.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        media_manifest_cache.update(stamp=stamp, data=data)
+    return media_manifest_cache["data"]
+
+
+def update_media_manifest(kind, add=(), remove=()):
+    """Manifest me entries jodo/hatao - ek locked atomic write"""
+    with log_lock(MEDIA_MANIFEST):
+        media_manifest_cache["stamp"] = None
+        data = copy.deepcopy(load_media_manifest())
+        for name in add:
+            data[kind][name] = f"{media_shard(name)}/{name}"
+        for name in remove:
+            data[kind].pop(name, None)
+        tmp_path = MEDIA_MANIFEST + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, MEDIA_MANIFEST)
+
+
+def media_target_path(kind, name):
+    """Nayi file kahan likhni hai (shard folder bana ke)"""
+    folder = os.path.join(MEDIA_ROOTS[kind], media_shard(name))
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, name)
+
+
+def media_path(kind, name):
+    """Naam -> disk path (shard, warna purana flat path); na mile to None"""
+    if not name or "/" in name or "\\" in name or name.startswith("."):
+        return None
+    root = MEDIA_ROOTS[kind]
+    for path in (
+        os.path.join(root, media_shard(name), name),
+        os.path.join(root, name),
+    ):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def register_media(kind, names):
+    """Upload ke baad manifest me daalo; same naam ki purani flat copy hatao"""
+    for name in names:
+        flat = os.path.join(MEDIA_ROOTS[kind], name)
+        if os.path.isfile(flat):
+            os.remove(flat)
+    if names:
+        update_media_manifest(kind, add=names)
+
+
+def delete_media(kind, name):
+    path = media_path(kind, name)
+    if path:
+        os.remove(path)
+    update_media_manifest(kind, remove=[name])
+    return path is not None
+
+
+def list_media(kind):
+    """Manifest ke naam + abhi tak migrate na hui flat files"""
+    names = set(load_media_manifest()[kind])
+    root = MEDIA_ROOTS[kind]
+    if os.path.isdir(root):
+        names.update(entry.name for entry in os.scandir(root) if entry.is_file())
+    return names
+
+
+def media_version(kind):
+    return f"{data_version(MEDIA_MANIFEST)}.{data_version(MEDIA_ROOTS[kind])}"
+
+
+@app.route("/static/pdfs/<filename>")
+def serve_pdf(filename):
+    return serve_media("pdfs", filename)
+
+
+@app.route("/static/images/gallery/<filename>")
+def serve_gallery_image(filename):
+    return serve_media("gallery", filename)
+
+
+def serve_media(kind, filename):
+    path = media_path(kind, filename)
+    if path is None:
+        return not_found_error(None)
+    root = os.path.abspath(MEDIA_ROOTS[kind])
+    return send_from_directory(root, os.path.relpath(os.path.abspath(path), root))
+
+
+@app.cli.command("migrate-media")
+@click.option("--dry-run", is_flag=True, help="Sirf batao kya move hoga")
+def migrate_media_command(dry_run):
+    """Flat gallery/PDF folders ko sharded layout me le jao + manifest banao"""
+    for kind, root in MEDIA_ROOTS.items():
+        if not os.path.isdir(root):
+            continue
+        flat = sorted(entry.name for entry in os.scandir(root) if entry.is_file())
+        known = load_media_manifest()[kind]
+        # pehle se shard me padi par manifest me missing files bhi jodo
+        sharded = [
+            name
+            for shard in os.scandir(root)
+            if shard.is_dir() and len(shard.name) == 2
+            for sub in os.scandir(shard.path)
+            if sub.is_dir()
+            for name in os.listdir(sub.path)
+            if name not in known
+        ]
+        click.echo(f"{kind}: {len(flat)} flat files, {len(sharded)} unlisted shards")
+        if dry_run:
+            for name in flat[:20]:
+                click.echo(f"  {name} -> {media_shard(name)}/{name}")
+            continue
+
+        for name in flat:
+            os.replace(os.path.join(root, name), media_target_path(kind, name))
+        update_media_manifest(kind, add=flat + sharded)
+        total = len(load_media_manifest()[kind])
+        click.echo(f"  moved {len(flat)}, manifest now has {total}")
+
+
+GALLERY_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+GALLERY_UPLOAD_WORKERS = 4
+MAX_GALLERY_BATCH = 50
+MAX_GALLERY_FILE_SIZE = 5 * 1024 * 1024
+# poora album ek request me: files + multipart headers ke liye 1MB extra
+ROUTE_CONTENT_LENGTHS["upload_gallery_images"] = (
+    MAX_GALLERY_BATCH * MAX_GALLERY_FILE_SIZE + 1024 * 1024
+)
+
+
+def normalize_gallery_category(raw_category):
+    raw_category = (raw_category or "campus").lower()
+    if "campus" in raw_category:
+        return "campus"
+    elif "event" in raw_category:
+        return "events"
+    elif "lab" in raw_category:
+        return "labs"
+    elif "sport" in raw_category:
+        return "sports"
+    return "campus"
+
+
+def reserve_gallery_filename(original):
+    """img_<millis>_<naam>; O_EXCL se file reserve, isliye naam kabhi takrata nahi"""
+    clean = secure_filename(original) or "image"
+    millis = int(time.time() * 1000)
+    while True:
+        filename = f"img_{millis}_{clean}"
+        path = media_target_path("gallery", filename)
+        try:
+            if media_path("gallery", filename):
+                raise FileExistsError(filename)
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return filename, path
+        except FileExistsError:
+            millis += 1
+
+
+def looks_like_image(header):
+    return (
+        header.startswith(b"\xff\xd8\xff")
+        or header.startswith(b"\x89PNG\r\n\x1a\n")
+        or header[:6] in (b"GIF87a", b"GIF89a")
+        or (header[:4] == b"RIFF" and header[8:12] == b"WEBP")
+    )
+
+
+def process_gallery_upload(file):
+    """Ek file validate karke disk par stream karo (thread pool me chalta hai)"""
+    original = file.filename or ""
+    if not original.lower().endswith(GALLERY_EXTENSIONS):
+        return {"file": original, "success": False, "message": "Unsupported file type"}
+
+    header = file.stream.read(16)
+    file.stream.seek(0)
+    if not looks_like_image(header):
+        return {"file": original, "success": False, "message": "Not a valid image"}
+
+    filename, path = reserve_gallery_filename(original)
+    try:
+        written = 0
+        with open(path, "wb") as out:
+            for chunk in iter(lambda: file.stream.read(64 * 1024), b""):
+                written += len(chunk)
+                if written > MAX_GALLERY_FILE_SIZE:
+                    raise ValueError("File too big (max 5MB)")
+                out.write(chunk)
+    except Exception as e:
+        if os.path.exists(path):
+            os.remove(path)
+        return {"file": original, "success": False, "message": str(e)}
+
+    return {"file": original, "success": True, "filename": filename}
+
+
+def add_gallery_entries(entries):
+    """Saari nayi entries ek hi atomic metadata write me"""
+    with log_lock(GALLERY_DB):
+        db = load_gallery_db()
+        db.extend(entries)
+        if not save_gallery_db(db):
+            return False
+    register_media("gallery", [entry["filename"] for entry in entries])
+    return True
+
+
 @csrf.exempt
 @app.route("/admin/upload-gallery-image", methods=["POST"])
 def upload_gallery_image():
@@ -1359,18 +5043,7 @@ def upload_gallery_image():
         return jsonify({"success": False, "message": "No file part"})
 
     file = request.files["gallery_file"]
-    raw_category = request.form.get("category", "campus").lower()
-
-    if "campus" in raw_category:
-        category = "campus"
-    elif "event" in raw_category:
-        category = "events"
-    elif "lab" in raw_category:
-        category = "labs"
-    elif "sport" in raw_category:
-        category = "sports"
-    else:
-        category = "campus"
+    category = normalize_gallery_category(request.form.get("category", "campus"))
 
     if file.filename == "":
         return jsonify({"success": False, "message": "No selected file"})
@@ -1380,20 +5053,20 @@ def upload_gallery_image():
             # NEW: Safety check to ensure directory exists before saving
             os.makedirs(GALLERY_FOLDER, exist_ok=True)
 
-            filename = secure_filename(f"img_{int(time.time())}_{file.filename}")
-            file_path = os.path.join(GALLERY_FOLDER, filename)
+            filename, file_path = reserve_gallery_filename(file.filename)
             file.save(file_path)
 
             # ✅ Metadata Save Karo
-            db = load_gallery_db()
-            db.append(
-                {
-                    "filename": filename,
-                    "category": category,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                }
+            add_gallery_entries(
+                [
+                    {
+                        "filename": filename,
+                        "category": category,
+                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                    }
+                ]
             )
-            save_gallery_db(db)
+            publish_admin_event("upload", kind="gallery", filename=filename)
 
             return jsonify({"success": True, "message": "Image Uploaded Successfully!"})
         except Exception as e:
@@ -1402,18 +5075,73 @@ def upload_gallery_image():
     return jsonify({"success": False, "message": "Unknown error"})
 
 
+@csrf.exempt
+@app.route("/admin/upload-gallery-images", methods=["POST"])
+def upload_gallery_images():
+    """Poora event album ek request me; har file ka alag result"""
+    if not session.get("admin"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    files = [f for f in request.files.getlist("gallery_files") if f.filename]
+    if not files:
+        return jsonify({"success": False, "message": "No files selected"}), 400
+    if len(files) > MAX_GALLERY_BATCH:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": f"Max {MAX_GALLERY_BATCH} files per upload",
+                }
+            ),
+            413,
+        )
+
+    category = normalize_gallery_category(request.form.get("category", "campus"))
+    os.makedirs(GALLERY_FOLDER, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=GALLERY_UPLOAD_WORKERS) as pool:
+        results = list(pool.map(process_gallery_upload, files))
+
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+    entries = [
+        {"filename": r["filename"], "category": category, "timestamp": timestamp}
+        for r in results
+        if r["success"]
+    ]
+
+    if entries and not add_gallery_entries(entries):
+        for entry in entries:
+            delete_media("gallery", entry["filename"])
+        return jsonify({"success": False, "message": "Metadata save failed"}), 500
+
+    if entries:
+        publish_admin_event("upload", kind="gallery", count=len(entries))
+    return jsonify(
+        {
+            "success": bool(entries),
+            "uploaded": len(entries),
+            "failed": len(results) - len(entries),
+            "results": results,
+        }
+    )
+
+
 @app.route("/admin/get-unknown-queries")
 def get_unknown_queries():
     if not session.get("admin"):
         return jsonify({"success": False, "message": "Unauthorized"}), 401
 
-    queries = []
-    file_path = "data/unknown_queries.csv"
-    if os.path.exists(file_path):
-        with open(file_path, mode="r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                queries.append(row)
+    limit = request.args.get("limit", type=int)
+    if limit:
+        return jsonify(tail_log_rows(UNKNOWN_QUERIES_LOG, limit))
+
+    queries = list(
+        read_log_rows(
+            UNKNOWN_QUERIES_LOG,
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+        )
+    )
     return jsonify(queries[::-1])  # Taki nayi queries upar dikhen
 
 
@@ -1438,14 +5166,9 @@ def get_gallery_images():
     images = []
     import os
 
-    gallery_path = os.path.join(app.static_folder, "images", "gallery")
-
-    if not os.path.exists(gallery_path):
-        os.makedirs(gallery_path)
-
     images = []
     try:
-        for filename in os.listdir(gallery_path):
+        for filename in list_media("gallery"):
             if filename.lower().endswith((".png", ".jpg", ".jpeg", ".gif", ".webp")):
 
                 name_lower = filename.lower()
@@ -1526,7 +5249,9 @@ def get_gallery_images():
     except Exception as e:
         print(f"Error reading gallery: {e}")
 
-    return jsonify(images)
+    response = jsonify(images)
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 @app.route("/delete-syllabus", methods=["POST"])
@@ -1548,13 +5273,12 @@ def delete_syllabus():
 
         filename = target_course.get("syllabus", "")
         if filename:
-            file_path = os.path.join(app.static_folder, "pdfs", filename)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            delete_media("pdfs", os.path.basename(filename))
 
         target_course["syllabus"] = ""
 
         save_college_data(college_data)
+        publish_admin_event("delete", kind="syllabus", filename=filename)
 
         return jsonify({"success": True, "message": "Syllabus deleted successfully!"})
     except Exception as e:
@@ -1570,14 +5294,225 @@ def load_feedback_data():
         return json.load(f)
 
 def load_unknown_queries():
-    path = os.path.join("data", "unknown_queries.csv")
+    return list(read_log_rows(UNKNOWN_QUERIES_LOG))
+
+# ---------- UNKNOWN QUERY CLUSTERS (MinHash + LSH) ----------
+# Milti-julti unknown queries ko ek cluster me daalo taaki admin sabse bade
+# gaps pehle dekh sake. Job incremental hai: sirf naye rows process hote hain.
+# Resolved queries cluster me nahi gint: status badalne par us row ka cluster
+# count ghata/badha dete hain (state["resolved"][row index] = cluster id),
+# rebuild nahi. `seen` (exact text -> cluster) sirf fast path hai, isliye
+# MAX_CLUSTER_SEEN par purani aadhi entries hata di jaati hain.
+CLUSTERS_DB = os.path.join("data", "query_clusters.json")
+MINHASH_PERM = 32
+LSH_BANDS = 8
+LSH_ROWS = MINHASH_PERM // LSH_BANDS
+MAX_CLUSTER_EXAMPLES = 5
+MAX_CLUSTER_SEEN = 20000
+MINHASH_PRIME = (1 << 61) - 1
+MINHASH_SEEDS = [
+    (
+        zlib.crc32(f"a{i}".encode()) * 2 + 1,
+        zlib.crc32(f"b{i}".encode()),
+    )
+    for i in range(MINHASH_PERM)
+]
 
-    if not os.path.exists(path):
-        return []
 
-    with open(path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        return list(reader)
+def normalize_query(text):
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
+
+
+def minhash_signature(normalized):
+    padded = f" {normalized} "
+    shingles = {padded[i : i + 3] for i in range(max(len(padded) - 2, 1))}
+    hashes = [zlib.crc32(sh.encode("utf-8")) for sh in shingles]
+    return [min((a * h + b) % MINHASH_PRIME for h in hashes) for a, b in MINHASH_SEEDS]
+
+
+def lsh_keys(signature):
+    return [
+        f"{band}:{zlib.crc32(repr(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]).encode()):x}"
+        for band in range(LSH_BANDS)
+    ]
+
+
+def empty_query_clusters():
+    return {
+        "offset": 0,
+        "next_id": 0,
+        "clusters": {},
+        "buckets": {},
+        "seen": {},
+        "resolved": {},
+    }
+
+
+def load_query_clusters():
+    if os.path.exists(CLUSTERS_DB):
+        try:
+            with open(CLUSTERS_DB, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            state.setdefault("resolved", {})
+            return state
+        except (json.JSONDecodeError, ValueError):
+            return empty_query_clusters()
+    return empty_query_clusters()
+
+
+def save_query_clusters(state):
+    tmp_path = CLUSTERS_DB + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, CLUSTERS_DB)
+
+
+def cluster_root(clusters, cid):
+    # merged clusters "merged_into" se asli cluster tak pahunchte hain
+    while "merged_into" in clusters[cid]:
+        cid = clusters[cid]["merged_into"]
+    return cid
+
+
+def assign_query_cluster(state, text):
+    """Query ka cluster id (zaroorat ho to naya / merge); khaali query par None"""
+    clusters = state["clusters"]
+    buckets = state["buckets"]
+    seen = state["seen"]
+    normalized = normalize_query(text)
+    if not normalized:
+        return None
+    if normalized in seen:
+        return cluster_root(clusters, seen[normalized])
+
+    keys = lsh_keys(minhash_signature(normalized))
+    candidates = {cluster_root(clusters, buckets[k]) for k in keys if k in buckets}
+    if candidates:
+        cid = max(candidates, key=lambda c: clusters[c]["count"])
+        for other in candidates - {cid}:
+            clusters[cid]["count"] += clusters[other]["count"]
+            clusters[cid]["examples"] = (
+                clusters[cid]["examples"] + clusters[other]["examples"]
+            )[:MAX_CLUSTER_EXAMPLES]
+            clusters[cid]["last_seen"] = max(
+                clusters[cid]["last_seen"], clusters[other]["last_seen"]
+            )
+            clusters[other] = {"merged_into": cid}
+    else:
+        cid = str(state["next_id"])
+        state["next_id"] += 1
+        clusters[cid] = {"count": 0, "examples": [], "last_seen": ""}
+
+    for k in keys:
+        buckets.setdefault(k, cid)
+    if len(seen) >= MAX_CLUSTER_SEEN:
+        # dict insertion order me hai - purani aadhi entries hatao
+        for old in list(islice(seen, len(seen) - MAX_CLUSTER_SEEN // 2)):
+            del seen[old]
+    seen[normalized] = cid
+    if len(clusters[cid]["examples"]) < MAX_CLUSTER_EXAMPLES:
+        clusters[cid]["examples"].append(text)
+    return cid
+
+
+def update_query_clusters(rebuild=False):
+    """unknown_queries.csv ke naye rows ko clusters me jodo"""
+    with log_lock(CLUSTERS_DB):
+        state = empty_query_clusters() if rebuild else load_query_clusters()
+        dropped, total, _ = log_rows_version(UNKNOWN_QUERIES_LOG)
+        if state.get("dropped", 0) != dropped or total - dropped < state["offset"]:
+            # purane segments hat gaye (row index khisak gaye) / file reset
+            state = empty_query_clusters()
+        state["dropped"] = dropped
+
+        clusters = state["clusters"]
+        index = state["offset"]
+        for row in read_log_rows(UNKNOWN_QUERIES_LOG, start=state["offset"]):
+            cid = assign_query_cluster(state, row.get("query") or "")
+            if cid is not None:
+                if (row.get("status") or "").lower() == "resolved":
+                    # gina nahi, par un-resolve hua to yahin wapas judega
+                    state["resolved"][str(index)] = cid
+                else:
+                    clusters[cid]["count"] += 1
+                    clusters[cid]["last_seen"] = max(
+                        clusters[cid]["last_seen"], row.get("timestamp") or ""
+                    )
+            index += 1
+
+        state["offset"] = index
+        save_query_clusters(state)
+    return state
+
+
+def record_query_status(index, row):
+    """Query ka status badla - us row ka cluster count ghatao/badhao"""
+    resolved = (row.get("status") or "").lower() == "resolved"
+    key = str(index)
+    with log_lock(CLUSTERS_DB):
+        state = load_query_clusters()
+        if index >= state["offset"]:
+            return  # row abhi process nahi hua; agla update status khud dekhega
+        if resolved == (key in state["resolved"]):
+            return
+
+        clusters = state["clusters"]
+        if resolved:
+            cid = assign_query_cluster(state, row.get("query") or "")
+            if cid is None:
+                return
+            clusters[cid]["count"] = max(clusters[cid]["count"] - 1, 0)
+            state["resolved"][key] = cid
+        else:
+            cid = cluster_root(clusters, state["resolved"].pop(key))
+            clusters[cid]["count"] += 1
+        save_query_clusters(state)
+
+
+def ranked_query_clusters(state, limit=None):
+    ranked = sorted(
+        (
+            {"id": cid, **info}
+            for cid, info in state["clusters"].items()
+            if "merged_into" not in info and info["count"] > 0
+        ),
+        key=lambda c: (c["count"], c["last_seen"]),
+        reverse=True,
+    )
+    return ranked[:limit] if limit else ranked
+
+
+@app.route("/admin/query-clusters")
+def admin_query_clusters():
+    if not session.get("admin"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    limit = request.args.get("limit", 50, type=int)
+    try:
+        state = update_query_clusters()
+    except Exception as e:
+        print(f"Cluster update error: {e}")
+        return jsonify({"success": False, "message": "Error building clusters"}), 500
+
+    return jsonify(
+        {
+            "success": True,
+            "total_queries": state["offset"],
+            "clusters": ranked_query_clusters(state, limit),
+        }
+    )
+
+
+@app.cli.command("cluster-queries")
+@click.option("--rebuild", is_flag=True, help="Saari history se dobara banao")
+@click.option("--top", default=20, help="Kitne clusters print karne hain")
+def cluster_queries_command(rebuild, top):
+    """Unknown queries ko cluster karo (cron se chalane layak)"""
+    state = update_query_clusters(rebuild=rebuild)
+    click.echo(f"{state['offset']} queries processed")
+    for cluster in ranked_query_clusters(state, top):
+        click.echo(f"{cluster['count']:>6}  {' | '.join(cluster['examples'][:3])}")
+
 
 @csrf.exempt
 @app.route("/admin/update-status", methods=["POST"])
@@ -1607,36 +5542,30 @@ def update_status():
         with open(path, "w", encoding="utf-8") as f:
             json.dump(feedback_list, f, indent=2)
 
+        publish_admin_event("status", item="feedback", index=index, status=new_status)
         return jsonify(success=True)
 
         # ---------- UNKNOWN QUERIES ----------
     elif item_type == "query":
-        path = os.path.join("data", "unknown_queries.csv")
-        rows = load_unknown_queries()  # returns list(dict)
-
-        # look up by unique timestamp sent from frontend
-    found = False
-    if index is None:
-        return jsonify(success=False, message="Invalid index"), 400
-
-    if index < 0 or index >= len(rows):
-        return jsonify(success=False, message="Item not found"), 404
-
-
-    rows[index]["status"] = new_status
-    found = True
+        if index is None:
+            return jsonify(success=False, message="Invalid index"), 400
 
-    if not found:
-        return jsonify(success=False, message="Item not found"), 404
+        # sirf us row wala segment / active file dobara likhi jaati hai
+        row = update_log_row(UNKNOWN_QUERIES_LOG, index, {"status": new_status})
+        if row is None:
+            return jsonify(success=False, message="Item not found"), 404
 
-        # save CSV back (preserve header order)
-    with open(path, "w", newline="", encoding="utf-8") as f:
-            # ensure fieldnames match CSV header order
-            writer = csv.DictWriter(f, fieldnames=rows[0].keys())
-            writer.writeheader()
-            writer.writerows(rows)
+        # Resolve ke saath jawab diya ho to bot use retrieval me seekh leta hai
+        answer = (data.get("answer") or "").strip()
+        if new_status == "resolved" and answer:
+            save_learned_answer(row.get("query", ""), answer)
 
-            return jsonify(success=True)
+        try:
+            record_query_status(index, row)
+        except Exception as e:
+            print(f"Cluster status error: {e}")
+        publish_admin_event("status", item="query", index=index, status=new_status)
+        return jsonify(success=True)
 
     return jsonify(success=False, message="Invalid type"), 400
 
@@ -1644,6 +5573,558 @@ def update_status():
 def handle_csrf_error(e):
     return "Session expired. Please refresh the page and try again.", 400
 
+
+# ---------- RESPONSE COMPRESSION (WSGI middleware) ----------
+# Accept-Encoding dekh ke brotli/gzip. ETag wale responses ka compressed body
+# yaad rakha jaata hai taki same body dobara compress na ho.
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_CACHE_MAX = 256
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+)
+
+compression_cache = OrderedDict()
+compression_lock = threading.Lock()
+compression_stats = {
+    "responses": 0,
+    "cache_hits": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "cpu_seconds": 0.0,
+}
+
+
+def choose_encoding(accept_encoding):
+    accept = (accept_encoding or "").lower()
+    if brotli is not None and "br" in accept:
+        return "br"
+    if "gzip" in accept:
+        return "gzip"
+    return None
+
+
+def compress_body(body, encoding, etag):
+    key = (etag, encoding) if etag else None
+    if key:
+        with compression_lock:
+            cached = compression_cache.get(key)
+            if cached is not None:
+                compression_cache.move_to_end(key)
+                compression_stats["cache_hits"] += 1
+                return cached
+
+    started = time.thread_time()
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=5)
+    else:
+        compressed = gzip.compress(body, 6)
+    spent = time.thread_time() - started
+
+    with compression_lock:
+        compression_stats["cpu_seconds"] += spent
+        if key:
+            compression_cache[key] = compressed
+            while len(compression_cache) > COMPRESS_CACHE_MAX:
+                compression_cache.popitem(last=False)
+    return compressed
+
+
+def encoding_etag(etag, encoding):
+    """'"abc"' -> '"abc-gzip"' (W/ ho to bhi andar hi suffix)"""
+    return etag[:-1] + f'-{encoding}"'
+
+
+def compression_middleware(wsgi_app):
+    def middleware(environ, start_response):
+        # If-Match (PATCH ka version) me bhi hamara suffix ho sakta hai - hatao,
+        # chahe is request me Accept-Encoding ho ya na ho
+        if_match = environ.get("HTTP_IF_MATCH")
+        if if_match:
+            environ["HTTP_IF_MATCH"] = re.sub(r'-(gzip|br)"', '"', if_match)
+
+        encoding = choose_encoding(environ.get("HTTP_ACCEPT_ENCODING"))
+        if encoding is None:
+            return wsgi_app(environ, start_response)
+
+        # ETag ka "-gzip"/"-br" suffix sirf yahi middleware lagata hai (khud
+        # compress kiya ho ya app ne pehle se encoded body di ho); app hamesha
+        # base ETag dekhta aur banata hai
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match:
+            environ["HTTP_IF_NONE_MATCH"] = re.sub(
+                r'-(gzip|br)"', '"', if_none_match
+            )
+
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured.update(status=status, headers=headers, exc_info=exc_info)
+            return lambda data: captured.setdefault("early", []).append(data)
+
+        body_iter = wsgi_app(environ, capture)
+        headers = captured["headers"]
+        header_map = {k.lower(): v for k, v in headers}
+        status_code = int(captured["status"].split()[0])
+        content_type = header_map.get("content-type", "")
+
+        etag = header_map.get("etag")
+        suffixed = None
+        if status_code == 304 and if_none_match and etag:
+            # client ke paas compressed variant hai - wahi ETag lautao
+            suffixed = next(
+                (
+                    encoding_etag(etag, enc)
+                    for enc in (encoding, "gzip", "br")
+                    if encoding_etag(etag, enc) in if_none_match
+                ),
+                None,
+            )
+        elif header_map.get("content-encoding") in ("gzip", "br") and etag:
+            # app ne pehle se compressed body di (page cache) - suffix yahan
+            suffixed = encoding_etag(etag, header_map["content-encoding"])
+        if suffixed:
+            headers = [
+                (k, suffixed if k.lower() == "etag" else v) for k, v in headers
+            ]
+
+        if (
+            status_code < 200
+            or status_code in (204, 206, 304)
+            or "content-encoding" in header_map
+            or content_type.startswith("text/event-stream")
+            or not content_type.startswith(COMPRESSIBLE_TYPES)
+            # Content-Length nahi = generator se stream (export); buffer mat karo
+            or "content-length" not in header_map
+            or int(header_map["content-length"]) < COMPRESS_MIN_SIZE
+        ):
+            write = start_response(
+                captured["status"], headers, captured["exc_info"]
+            )
+            for data in captured.get("early", []):
+                write(data)
+            return body_iter
+
+        try:
+            body = b"".join(captured.get("early", []) + list(body_iter))
+        finally:
+            if hasattr(body_iter, "close"):
+                body_iter.close()
+
+        if len(body) < COMPRESS_MIN_SIZE:
+            start_response(captured["status"], headers, captured["exc_info"])
+            return [body]
+
+        compressed = compress_body(body, encoding, etag)
+
+        new_headers = [
+            (k, v)
+            for k, v in headers
+            if k.lower() not in ("content-length", "etag", "vary")
+        ]
+        vary = header_map.get("vary")
+        new_headers.append(
+            ("Vary", f"{vary}, Accept-Encoding" if vary else "Accept-Encoding")
+        )
+        new_headers.append(("Content-Encoding", encoding))
+        new_headers.append(("Content-Length", str(len(compressed))))
+        if etag:
+            new_headers.append(("ETag", encoding_etag(etag, encoding)))
+
+        with compression_lock:
+            compression_stats["responses"] += 1
+            compression_stats["bytes_in"] += len(body)
+            compression_stats["bytes_out"] += len(compressed)
+
+        start_response(captured["status"], new_headers, captured["exc_info"])
+        return [compressed]
+
+    return middleware
+
+
+app.wsgi_app = compression_middleware(app.wsgi_app)
+
+
+@app.route("/admin/compression-stats")
+def admin_compression_stats():
+    """Is worker ke compression metrics"""
+    if not session.get("admin"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    with compression_lock:
+        stats = dict(compression_stats)
+    stats["cached_bodies"] = len(compression_cache)
+    stats["ratio"] = (
+        round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else 0
+    )
+    return jsonify({"success": True, "pid": os.getpid(), **stats})
+
+# ---------- TRAFFIC CAPTURE + REPLAY ----------
+# Opt-in (TRAFFIC_CAPTURE=1): sampled requests ka route, method, body
+# (password jaise fields hata ke) aur timing ek deque ring buffer me jaata
+# hai - append GIL par atomic hai, request thread kabhi lock/disk par nahi
+# rukta. Background thread har kuch second me buffer ko
+# data/capture/requests-<time>-<pid>.jsonl me flush karta hai.
+# `flask replay-traffic` in files ko local instance par dobara chalata hai.
+TRAFFIC_CAPTURE = os.getenv("TRAFFIC_CAPTURE", "0") == "1"
+CAPTURE_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE", "0.1"))
+CAPTURE_DIR = os.path.join("data", "capture")
+CAPTURE_BUFFER_SIZE = 4096
+CAPTURE_FLUSH_SECONDS = 5
+CAPTURE_ROTATE_BYTES = 5 * 1024 * 1024
+CAPTURE_RETAIN_FILES = 50
+CAPTURE_MAX_BODY = 64 * 1024
+CAPTURE_BODY_TYPES = ("application/json", "application/x-www-form-urlencoded")
+CAPTURE_SENSITIVE_FIELDS = {
+    "password",
+    "new_password",
+    "old_password",
+    "secret_code",
+    "csrf_token",
+    "username",
+    "email",
+    "phone",
+    "mobile",
+    "name",
+}
+
+capture_buffer = deque(maxlen=CAPTURE_BUFFER_SIZE)
+capture_state = {"pid": None, "path": None, "captured": 0, "dropped": 0}
+
+
+def scrub_capture_data(value):
+    """Sensitive keys (kisi bhi level par) hata do"""
+    if isinstance(value, dict):
+        return {
+            k: scrub_capture_data(v)
+            for k, v in value.items()
+            if str(k).lower() not in CAPTURE_SENSITIVE_FIELDS
+        }
+    if isinstance(value, list):
+        return [scrub_capture_data(v) for v in value]
+    return value
+
+
+def capture_body(environ):
+    """Chhote JSON/form body padho aur wsgi.input wapas bhar do"""
+    content_type = environ.get("CONTENT_TYPE", "").split(";")[0].strip()
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    if not length or content_type not in CAPTURE_BODY_TYPES:
+        return None, False
+    if length > CAPTURE_MAX_BODY:
+        return None, True
+
+    raw = environ["wsgi.input"].read(length)
+    environ["wsgi.input"] = io.BytesIO(raw)
+    try:
+        if content_type == "application/json":
+            body = json.loads(raw)
+        else:
+            body = dict(urllib.parse.parse_qsl(raw.decode("utf-8")))
+    except ValueError:
+        return None, True
+    return scrub_capture_data(body), False
+
+
+def flush_capture():
+    rows = []
+    while True:
+        try:
+            rows.append(capture_buffer.popleft())
+        except IndexError:
+            break
+    if not rows:
+        return 0
+
+    path = capture_state["path"]
+    if path is None or not os.path.exists(path) or (
+        os.path.getsize(path) > CAPTURE_ROTATE_BYTES
+    ):
+        os.makedirs(CAPTURE_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(CAPTURE_DIR, f"requests-{stamp}-{os.getpid()}.jsonl")
+        capture_state["path"] = path
+
+        files = sorted(
+            (e.path for e in os.scandir(CAPTURE_DIR) if e.name.endswith(".jsonl")),
+            key=os.path.getmtime,
+        )
+        for old in files[:-CAPTURE_RETAIN_FILES]:
+            os.remove(old)
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+    return len(rows)
+
+
+def capture_flusher():
+    while True:
+        time.sleep(CAPTURE_FLUSH_SECONDS)
+        try:
+            flush_capture()
+        except Exception as e:
+            print(f"Capture flush error: {e}")
+
+
+def ensure_capture_flusher():
+    """Har worker (fork ke baad) ka apna flusher thread"""
+    if capture_state["pid"] != os.getpid():
+        capture_state.update(pid=os.getpid(), path=None)
+        threading.Thread(target=capture_flusher, daemon=True).start()
+
+
+def capture_middleware(wsgi_app):
+    def middleware(environ, start_response):
+        if random.random() >= CAPTURE_SAMPLE_RATE:
+            return wsgi_app(environ, start_response)
+
+        ensure_capture_flusher()
+        started = time.time()
+        try:
+            body, body_skipped = capture_body(environ)
+        except Exception:
+            body, body_skipped = None, True
+        query = scrub_capture_data(
+            dict(urllib.parse.parse_qsl(environ.get("QUERY_STRING", "")))
+        )
+        record = {
+            "ts": round(started, 4),
+            "method": environ.get("REQUEST_METHOD", "GET"),
+            "path": environ.get("PATH_INFO", "/"),
+            "query": query,
+            "content_type": environ.get("CONTENT_TYPE", ""),
+            "body": body,
+            "body_skipped": body_skipped,
+            "ua": user_agent_family(environ.get("HTTP_USER_AGENT")),
+            "accept_encoding": environ.get("HTTP_ACCEPT_ENCODING", ""),
+        }
+
+        def capture_start(status, headers, exc_info=None):
+            record["status"] = int(status.split()[0])
+            return start_response(status, headers, exc_info)
+
+        try:
+            return wsgi_app(environ, capture_start)
+        finally:
+            record["duration_ms"] = round((time.time() - started) * 1000, 2)
+            if len(capture_buffer) == CAPTURE_BUFFER_SIZE:
+                capture_state["dropped"] += 1
+            capture_buffer.append(record)
+            capture_state["captured"] += 1
+
+    return middleware
+
+
+if TRAFFIC_CAPTURE:
+    app.wsgi_app = capture_middleware(app.wsgi_app)
+    atexit.register(flush_capture)
+
+
+def load_capture_records(paths):
+    records = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+    records.sort(key=lambda r: r.get("ts", 0))
+    return records
+
+
+def replay_record(target, record):
+    """Ek captured request bhejo: (status, latency ms)"""
+    url = target.rstrip("/") + record["path"]
+    if record.get("query"):
+        url += "?" + urllib.parse.urlencode(record["query"])
+
+    data = None
+    headers = {"User-Agent": f"traffic-replay ({record.get('ua', 'other')})"}
+    if record.get("accept_encoding"):
+        headers["Accept-Encoding"] = record["accept_encoding"]
+    if record.get("body") is not None:
+        if record["content_type"].startswith("application/json"):
+            data = json.dumps(record["body"]).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        else:
+            data = urllib.parse.urlencode(record["body"]).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+    req = urllib.request.Request(
+        url, data=data, headers=headers, method=record.get("method", "GET")
+    )
+    started = time.time()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, (time.time() - started) * 1000
+
+
+@app.cli.command("replay-traffic")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--target", default="http://127.0.0.1:5000", help="Local instance URL")
+@click.option("--speed", default=1.0, help="2 = do guna tez, 0 = bina ruke")
+@click.option("--workers", default=16, help="Parallel requests")
+@click.option("--limit", default=0, help="Sirf pehle N requests")
+def replay_traffic_command(paths, target, speed, workers, limit):
+    """Captured JSONL traffic ko recorded (ya scaled) speed par dobara chalao"""
+    records = load_capture_records(paths)
+    if limit:
+        records = records[:limit]
+    if not records:
+        click.echo("No captured requests found")
+        return
+
+    first_ts = records[0]["ts"]
+    started = time.time()
+    lags = []
+
+    def send(record):
+        if speed > 0:
+            due = started + (record["ts"] - first_ts) / speed
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            lags.append(max(time.time() - due, 0) * 1000)
+        return record, replay_record(target, record)
+
+    statuses = {}
+    latencies = []
+    mismatched = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for record, (status, latency) in pool.map(send, records):
+            statuses[status] = statuses.get(status, 0) + 1
+            latencies.append(latency)
+            if status != record.get("status"):
+                mismatched += 1
+
+    latencies.sort()
+
+    def pick(q):
+        return latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+
+    elapsed = time.time() - started
+    click.echo(
+        f"{len(records)} requests in {elapsed:.1f}s "
+        f"(recorded span {records[-1]['ts'] - first_ts:.1f}s, speed {speed}x)"
+    )
+    click.echo(
+        f"latency ms: p50 {pick(0.5):.1f}  p95 {pick(0.95):.1f}  "
+        f"max {latencies[-1]:.1f}"
+    )
+    if lags:
+        click.echo(f"schedule lag ms: max {max(lags):.1f}")
+    click.echo(f"status: {dict(sorted(statuses.items()))}  mismatched: {mismatched}")
+
+
+# ---------- APP FACTORY + WARM-UP ----------
+def current_memory_mb():
+    """(rss, private) MB - private = is process ki apni pages (COW ke baad)"""
+    rss = private = 0.0
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            for line in f:
+                field, value = line.split(":", 1)
+                if field == "Rss":
+                    rss = int(value.split()[0]) / 1024
+                elif field in ("Private_Clean", "Private_Dirty"):
+                    private += int(value.split()[0]) / 1024
+    except (OSError, ValueError):
+        try:
+            import resource
+
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        except ImportError:
+            pass
+    return rss, private
+
+
+def warm_up():
+    """Pehli request se pehle saare caches bana do (--preload me fork se pehle)"""
+    started = time.time()
+
+    global college_info
+    college_info = load_college_data()
+    if ensure_knowledge_snapshot() is None:
+        get_course_index()
+    refresh_retrieval_index()
+
+    for name in app.jinja_env.list_templates():
+        if name.endswith(".html"):
+            app.jinja_env.get_template(name)
+
+    with app.test_request_context("/", headers={"Accept-Encoding": "gzip"}):
+        api_college_info()
+        api_courses()
+        api_facilities()
+        home()
+        syllabus_page()
+        not_found_error(None)
+
+    rss, private = current_memory_mb()
+    print(
+        f"🔥 Warm-up done in {(time.time() - started) * 1000:.0f} ms "
+        f"(pid {os.getpid()}, RSS {rss:.1f} MB, private {private:.1f} MB)"
+    )
+
+
+@app.cli.command("precompile-templates")
+@click.option("--prune/--no-prune", default=True, help="Purane bytecode files hatao")
+def precompile_templates_command(prune):
+    """templates/ ke saare templates compile karke bytecode cache me likho"""
+    env = app.jinja_env
+    cache = env.bytecode_cache
+    keep = set()
+    compiled = reused = 0
+    for name in env.list_templates():
+        source, filename, _ = env.loader.get_source(env, name)
+        bucket = cache.get_bucket(env, name, filename, source)
+        keep.add(cache.cache_path(name))
+        if bucket.code is None:
+            # get_template compile karke bucket khud likh deta hai
+            env.get_template(name)
+            compiled += 1
+        else:
+            reused += 1
+
+    removed = 0
+    if prune and os.path.isdir(JINJA_CACHE_DIR):
+        for entry in os.scandir(JINJA_CACHE_DIR):
+            if entry.name.endswith(".cache") and entry.path not in keep:
+                os.remove(entry.path)
+                removed += 1
+    click.echo(f"Templates: {compiled} compiled, {reused} cached, {removed} pruned")
+
+
+def create_app():
+    """gunicorn "app:create_app()" --preload: warm caches workers me COW share"""
+    started = time.time()
+    os.makedirs("data", exist_ok=True)
+    os.makedirs(GALLERY_FOLDER, exist_ok=True)
+    os.makedirs(PDF_FOLDER, exist_ok=True)
+
+    warm_up()
+
+    # warm objects ko GC se bahar rakho taki fork ke baad pages copy na hon
+    gc.collect()
+    gc.freeze()
+    print(f"🎓 App ready in {(time.time() - started) * 1000:.0f} ms")
+    return app
+
+
 if __name__ == "__main__":
     print("🎓 Sai College Chatbot Starting...")
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    create_app().run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,29 @@
+# Gunicorn settings: bas `gunicorn` chalao (ye file apne aap load hoti hai)
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+
+# App factory master me ek baar chalti hai aur caches warm karti hai;
+# fork ke baad workers wahi memory copy-on-write share karte hain.
+wsgi_app = "app:create_app()"
+preload_app = True
+
+# /chat/stream ek thread ko pakad ke rakhta hai, isliye threaded worker zaroori hai.
+# Har worker me sirf threads // 4 chat stream khul sakte hain (baaki threads
+# normal requests ke liye), aur stream idle/max time par khud band hota hai.
+# Chat channel worker memory me hota hai; dusre worker par pahunchi /chat/send
+# request ka jawab wahi worker seedha response me de deta hai.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+timeout = 60
+keepalive = 30
+
+
+def post_fork(server, worker):
+    from app import current_memory_mb
+
+    rss, private = current_memory_mb()
+    server.log.info(
+        "Worker %s booted: RSS %.1f MB, private %.1f MB", worker.pid, rss, private
+    )
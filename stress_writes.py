@@ -0,0 +1,398 @@
+# Write stress suite: alag se chal rahe server par parallel writers.
+#
+# /feedback, /admin/update-status aur PDF/gallery upload sab JSON/CSV par
+# read-modify-write karte hain. Ye script kai processes se in endpoints ko ek
+# saath hit karti hai, phir check karti hai ki koi write khoya ya file kharab to
+# nahi hui. Throughput + tail latency JSON me save hoti hai taki storage layer
+# badalne par purane baseline se compare ho sake.
+#
+# Server pehle khud chalao - project ki ek COPY par, kyunki ye feedback, query
+# status, PDFs aur gallery me sach me likhti hai:
+#
+#   RATE_LIMIT_ALLOWLIST=127.0.0.1 WEB_CONCURRENCY=4 gunicorn
+#   python stress_writes.py --base http://127.0.0.1:8000 \
+#       --username admin --password ... --data-dir /copy/data
+#
+# Sirf stdlib; app.py import nahi hota.
+import argparse
+import hashlib
+import json
+import os
+import secrets
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+STRESS_DIR = os.path.join("data", "stress")
+LOG_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+STRESS_OPS = [
+    "feedback",
+    "feedback_status",
+    "query_status",
+    "upload_pdf",
+    "upload_gallery",
+]
+STRESS_PNG = b"\x89PNG\r\n\x1a\n" + bytes(256)
+
+
+def multipart_body(fields, files):
+    """(body, content type) - fields: {naam: value}, files: {naam: (file, bytes)}"""
+    boundary = secrets.token_hex(12)
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"'
+            f"\r\n\r\n{value}\r\n".encode()
+        )
+    for name, (filename, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+            f'filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n".encode()
+            + content
+            + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def stress_request(base, path, cookies, method="GET", json_body=None, form=None):
+    """(status, body, latency ms); Set-Cookie se cookies dict update hota hai.
+    Session cookie Secure hai, isliye http par cookie khud bhejte hain."""
+    headers = {"User-Agent": "stress-writes"}
+    data = None
+    if json_body is not None:
+        data = json.dumps(json_body).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    elif form is not None:
+        data, headers["Content-Type"] = multipart_body(*form)
+    if cookies.get("csrf"):
+        headers["X-CSRFToken"] = cookies["csrf"]
+    jar = {k: v for k, v in cookies.items() if k != "csrf"}
+    if jar:
+        headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in jar.items())
+
+    req = urllib.request.Request(base + path, data=data, headers=headers, method=method)
+    started = time.time()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            status, body, set_cookies = resp.status, resp.read(), resp.headers
+    except urllib.error.HTTPError as e:
+        status, body, set_cookies = e.code, e.read(), e.headers
+    except (urllib.error.URLError, OSError):
+        return 0, b"", (time.time() - started) * 1000
+    latency = (time.time() - started) * 1000
+
+    for header in set_cookies.get_all("Set-Cookie") or []:
+        name, _, value = header.split(";", 1)[0].partition("=")
+        cookies[name.strip()] = value
+    return status, body, latency
+
+
+def stress_login(base, username, password):
+    """Admin session + CSRF token wali cookies; login fail ho to None"""
+    cookies = {}
+    status, body, _ = stress_request(
+        base,
+        "/adminlogin",
+        cookies,
+        "POST",
+        {"username": username, "password": password},
+    )
+    if status != 200 or not json.loads(body or b"{}").get("success"):
+        return None
+    status, body, _ = stress_request(base, "/csrf-token", cookies)
+    if status == 200:
+        cookies["csrf"] = json.loads(body)["csrf_token"]
+    return cookies
+
+
+def stress_client(job):
+    """Ek client process: ops round-robin chalao, jo likha uska record lautao"""
+    base, client, ops, run_id, username, password, query_indexes = job
+    cookies = stress_login(base, username, password) or {}
+    result = {
+        "samples": [],
+        "feedback": [],
+        "pdfs": {},
+        "gallery": [],
+        "query_status": {},
+    }
+
+    for n in range(ops):
+        kind = STRESS_OPS[(client + n) % len(STRESS_OPS)]
+        marker = f"stress-{run_id}-{client}-{n}"
+        if kind == "feedback":
+            status, body, ms = stress_request(
+                base,
+                "/feedback",
+                cookies,
+                "POST",
+                {"type": "suggestion", "message": marker, "rating": 5},
+            )
+            if status == 200:
+                result["feedback"].append(marker)
+        elif kind == "feedback_status":
+            status, body, ms = stress_request(
+                base,
+                "/admin/update-status",
+                cookies,
+                "POST",
+                {"type": "feedback", "index": n % 5, "status": "read"},
+            )
+        elif kind == "query_status" and query_indexes:
+            index = query_indexes[n % len(query_indexes)]
+            status, body, ms = stress_request(
+                base,
+                "/admin/update-status",
+                cookies,
+                "POST",
+                {"type": "query", "index": index, "status": marker},
+            )
+            if status == 200:
+                result["query_status"][str(index)] = marker
+        elif kind == "upload_pdf":
+            name = f"stress_{run_id}_{client}_{n}.pdf"
+            content = f"%PDF-1.4\n% {marker}\n".encode() + os.urandom(2048)
+            fields = {"category": "syllabus", "course": "BCA", "semester": "1"}
+            status, body, ms = stress_request(
+                base,
+                "/admin/upload-pdf",
+                cookies,
+                "POST",
+                form=(fields, {"file": (name, content)}),
+            )
+            if status == 200 and json.loads(body or b"{}").get("success"):
+                result["pdfs"][name] = hashlib.sha1(content).hexdigest()
+        elif kind == "upload_gallery":
+            name = f"stress_{run_id}_{client}_{n}.png"
+            status, body, ms = stress_request(
+                base,
+                "/admin/upload-gallery-image",
+                cookies,
+                "POST",
+                form=({"category": "campus"}, {"gallery_file": (name, STRESS_PNG)}),
+            )
+            if status == 200 and json.loads(body or b"{}").get("success"):
+                result["gallery"].append(name)
+        else:
+            continue
+        result["samples"].append((kind, status, ms))
+    return result
+
+
+def check_data_files(data_dir, results):
+    """Server ki data folder (agar di ho): JSON files valid + gallery metadata"""
+    problems = []
+    for name in ("feedback.json", "syllabus_metadata.json", "gallery_metadata.json"):
+        path = os.path.join(data_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            problems.append(f"{name} corrupt: {e}")
+
+    try:
+        with open(os.path.join(data_dir, "gallery_metadata.json"), "r") as f:
+            metadata = f.read()
+    except FileNotFoundError:
+        metadata = ""
+    uploaded = [name for r in results for name in r["gallery"]]
+    unrecorded = [name for name in uploaded if name[:-4] not in metadata]
+    if unrecorded:
+        problems.append(f"gallery: {len(unrecorded)} missing from metadata")
+    return problems
+
+
+def verify_stress_writes(base, cookies, results, seeded):
+    """Jo likha gaya tha woh sab server par maujood hai? problems ki list"""
+    problems = []
+    status, body, _ = stress_request(base, "/admin/bootstrap", cookies)
+    if status != 200:
+        return [f"/admin/bootstrap returned {status}"]
+    sections = json.loads(body)["sections"]
+
+    messages = [row.get("message") for row in sections["feedback"]["rows"]]
+    counts = {}
+    for message in messages:
+        counts[message] = counts.get(message, 0) + 1
+    sent = [marker for r in results for marker in r["feedback"]]
+    lost = [marker for marker in sent if marker not in counts]
+    if lost:
+        problems.append(f"feedback: {len(lost)}/{len(sent)} writes lost")
+    duplicated = [marker for marker in sent if counts.get(marker, 0) > 1]
+    if duplicated:
+        problems.append(f"feedback: {len(duplicated)} duplicated")
+
+    rows = sections["queries"]["rows"][::-1]
+    expected = {}
+    for r in results:
+        expected.update(r["query_status"])
+    wrong = [
+        index
+        for index, status_text in expected.items()
+        if int(index) >= len(rows)
+        or rows[int(index)].get("query") != seeded[int(index)]
+        or rows[int(index)].get("status") != status_text
+    ]
+    if wrong:
+        problems.append(f"query status: {len(wrong)}/{len(expected)} not persisted")
+
+    listed = {row["filename"] for row in sections["files"]["rows"]}
+    missing = corrupt = 0
+    for r in results:
+        for name, digest in r["pdfs"].items():
+            if name not in listed:
+                missing += 1
+                continue
+            status, body, _ = stress_request(base, f"/static/pdfs/{name}", {})
+            if status != 200 or hashlib.sha1(body).hexdigest() != digest:
+                corrupt += 1
+    if missing or corrupt:
+        problems.append(f"pdfs: {missing} missing from list, {corrupt} bad content")
+
+    status, body, _ = stress_request(base, "/api/gallery-images", {})
+    listing = body.decode("utf-8", "ignore")
+    uploaded = [name for r in results for name in r["gallery"]]
+    missing = [name for name in uploaded if name[:-4] not in listing]
+    if missing:
+        problems.append(f"gallery: {len(missing)} missing from listing")
+    return problems
+
+
+def summarize_stress(results, elapsed):
+    by_kind = {}
+    for r in results:
+        for kind, status, ms in r["samples"]:
+            by_kind.setdefault(kind, []).append((status, ms))
+
+    def pick(latencies, q):
+        return round(latencies[min(int(len(latencies) * q), len(latencies) - 1)], 1)
+
+    summary = {}
+    for kind, samples in sorted(by_kind.items()):
+        latencies = sorted(ms for _, ms in samples)
+        summary[kind] = {
+            "requests": len(samples),
+            "errors": sum(1 for status, _ in samples if not 200 <= status < 300),
+            "per_second": round(len(samples) / elapsed, 1),
+            "p50_ms": pick(latencies, 0.5),
+            "p95_ms": pick(latencies, 0.95),
+            "p99_ms": pick(latencies, 0.99),
+            "max_ms": round(latencies[-1], 1),
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Parallel writers se lost/corrupt writes dhoondo + latency baseline"
+    )
+    parser.add_argument("--base", default="http://127.0.0.1:8000", help="Server URL")
+    parser.add_argument("--username", default=os.getenv("STRESS_ADMIN_USER", "admin"))
+    parser.add_argument("--password", default=os.getenv("STRESS_ADMIN_PASSWORD"))
+    parser.add_argument("--clients", type=int, default=16, help="Client processes")
+    parser.add_argument("--ops", type=int, default=50, help="Har client ki requests")
+    parser.add_argument("--data-dir", help="Server ki data/ folder (file checks)")
+    parser.add_argument("--output", help="Result JSON (default data/stress/)")
+    parser.add_argument("--baseline", help="Purana result JSON compare ke liye")
+    args = parser.parse_args(argv)
+
+    base = args.base.rstrip("/")
+    if not args.password:
+        parser.error("--password ya STRESS_ADMIN_PASSWORD do")
+    if stress_request(base, "/csrf-token", {})[0] != 200:
+        print(f"Server {base} par nahi mila, pehle gunicorn chalao")
+        return 1
+    admin = stress_login(base, args.username, args.password)
+    if admin is None:
+        print("Admin login fail hua, username/password check karo")
+        return 1
+
+    # har client ko apni unknown-query rows do, taki final status pakka ho
+    run_id = datetime.now().strftime("%H%M%S")
+    seed_cookies = {}
+    for k in range(args.clients * 2):
+        text = f"zzstress {run_id} q{k}"
+        stress_request(base, "/chat", seed_cookies, "POST", {"message": text})
+    _, body, _ = stress_request(base, "/admin/bootstrap", admin)
+    rows = json.loads(body)["sections"]["queries"]["rows"][::-1]
+    seeded = {
+        index: row["query"]
+        for index, row in enumerate(rows)
+        if row.get("query", "").startswith(f"zzstress {run_id} ")
+    }
+    owned = sorted(seeded)
+    login = (args.username, args.password)
+    jobs = [
+        (base, c, args.ops, run_id, *login, owned[c :: args.clients])
+        for c in range(args.clients)
+    ]
+
+    print(f"Server: {base}, {args.clients} clients x {args.ops} ops")
+    started = time.time()
+    with ProcessPoolExecutor(max_workers=args.clients) as pool:
+        results = list(pool.map(stress_client, jobs))
+    elapsed = time.time() - started
+
+    problems = verify_stress_writes(base, admin, results, seeded)
+    if args.data_dir:
+        problems += check_data_files(args.data_dir, results)
+    summary = summarize_stress(results, elapsed)
+    total = sum(item["requests"] for item in summary.values())
+    problems += [
+        f"{kind}: {item['errors']}/{item['requests']} requests failed"
+        for kind, item in summary.items()
+        if item["errors"]
+    ]
+    report = {
+        "time": datetime.now().strftime(LOG_TIME_FORMAT),
+        "config": {"base": base, "clients": args.clients, "ops": args.ops},
+        "elapsed_s": round(elapsed, 2),
+        "per_second": round(total / elapsed, 1),
+        "endpoints": summary,
+        "problems": problems,
+    }
+
+    print(f"{total} writes in {elapsed:.1f}s ({report['per_second']}/s)")
+    for kind, item in summary.items():
+        print(
+            f"  {kind:<16} {item['requests']:>5} req  {item['errors']:>4} err  "
+            f"p50 {item['p50_ms']:>7.1f}  p95 {item['p95_ms']:>7.1f}  "
+            f"p99 {item['p99_ms']:>7.1f} ms"
+        )
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        print(f"vs baseline {old.get('time')}: {old.get('per_second')}/s before")
+        for kind, item in summary.items():
+            before = old.get("endpoints", {}).get(kind)
+            if before and before.get("p95_ms"):
+                change = (item["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+                print(f"  {kind:<16} p95 {change:+.0f}%")
+
+    output = args.output
+    if output is None:
+        os.makedirs(STRESS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(STRESS_DIR, f"stress-{stamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Result: {output}")
+
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        return 1
+    print("✅ No lost or corrupt writes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())